@@ -0,0 +1,154 @@
+"""
+Seeded plaintext, key and ciphertext cases for the solver benchmark.
+
+Plaintexts are random runs of words, most of them drawn from the commonest
+words of English and the rest from `dictionary.txt`, so that the letter
+frequencies are close to those of real text and the words are ones
+`is_english(...)` knows. Punctuation and digits are sprinkled between the
+words at a chosen density. The same seed always gives the same cases.
+
+Example: -
+
+```python
+from decipher.benchmark.corpus import Case, make_case
+
+case = make_case(Case(size=1000, key_length=8, punctuation=0.1, index=0), seed=0)
+case.key, case.ciphertext[:40]
+```
+"""
+
+import random
+import functools
+import dataclasses
+
+from typing import Iterable, Iterator, List
+
+from decipher.utils.vig import ENGLISH_WORDS, encrypt
+
+
+# The commonest words of English, they make up about half of most texts.
+COMMON_WORDS: List[str] = """
+the of and to a in is it you that he was for on are with as his they be at
+one have this from or had by not word but what some we can out other were
+all there when up use your how said an each she which do their time if will
+way about many then them write would like so these her long make thing see
+him two has look more day could go come did number sound no most people my
+over know water than call first who may down side been now find any new work
+part take get place made live where after back little only round man year
+came show every good me give our under name very through just form sentence
+great think say help low line differ turn cause much mean before move right
+boy old too same tell does set three want air well also play small end put
+home read hand port large spell add even land here must big high such follow
+act why ask men change went light kind off need house picture try us again
+animal point mother world near build self earth father head stand own page
+""".upper().split()
+# Share of words drawn from COMMON_WORDS, the rest come from the word list.
+common_share: float = 0.6
+# Symbols put after words, numbers are put there as well.
+PUNCTUATION: List[str] = [",", ".", ";", ":", "!", "?", "-", "'", '"', "(", ")", "\n"]
+
+
+@dataclasses.dataclass(frozen=True)
+class Case(object):
+    """One benchmark case, before its text is generated.
+
+    Args:
+        size (int): Characters of plaintext.
+        key_length (int): Letters in the key, 1 is a Caesar cipher.
+        punctuation (float): Chance of a symbol or number after every word.
+        index (int): Tells apart cases with the same settings.
+    """
+
+    size: int
+    key_length: int
+    punctuation: float
+    index: int = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class GeneratedCase(object):
+    """A case with its plaintext, key and ciphertext."""
+
+    case: Case
+    key: str
+    plaintext: str
+    ciphertext: str
+
+
+@functools.lru_cache(maxsize=1)
+def dictionary_words() -> List[str]:
+    # Sorted, so that the same seed picks the same words.
+    return sorted(ENGLISH_WORDS.words)
+
+
+def make_plaintext(size: int, punctuation: float, rng: random.Random) -> str:
+    """Generate `size` characters of English-like text.
+
+    Args:
+        size (int): Characters of text.
+        punctuation (float): Chance of a symbol or number after every word.
+        rng (random.Random): Source of randomness.
+
+    Returns:
+        str: The text.
+    """
+    words = dictionary_words()
+    parts: List[str] = []
+    length = 0
+    while length < size:
+        word = rng.choice(COMMON_WORDS) if rng.random() < common_share else rng.choice(words)
+        word = word.capitalize() if rng.random() < 0.1 else word.lower()
+        if rng.random() < punctuation:
+            symbol = rng.choice(PUNCTUATION) if rng.random() < 0.8 else str(rng.randrange(1000))
+            word += symbol
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)[:size]
+
+
+def make_case(case: Case, seed: int = 0) -> GeneratedCase:
+    """Generate the text and key of a case.
+
+    Args:
+        case (Case): The case.
+        seed (int, optional): The seed of the whole corpus. Defaults to 0.
+
+    Returns:
+        GeneratedCase: The case with its plaintext, key and ciphertext.
+    """
+    rng = random.Random(f"{seed}/{case.size}/{case.key_length}/{case.punctuation}/{case.index}")
+    # Keys of more than one letter are never a single letter repeated.
+    while True:
+        key = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(case.key_length))
+        if case.key_length == 1 or len(set(key)) > 1:
+            break
+    plaintext = make_plaintext(case.size, case.punctuation, rng)
+    return GeneratedCase(case, key, plaintext, encrypt(key, plaintext))
+
+
+def make_cases(
+    sizes: Iterable[int],
+    key_lengths: Iterable[int],
+    punctuation: Iterable[float],
+    samples: int = 1,
+) -> List[Case]:
+    """Every combination of the settings, `samples` times.
+
+    Returns:
+        List[Case]: The cases, smallest texts first.
+    """
+    return [
+        Case(size, key_length, density, index)
+        for size in sorted(sizes)
+        for key_length in key_lengths
+        for density in punctuation
+        for index in range(samples)
+    ]
+
+
+def generate(cases: Iterable[Case], seed: int = 0) -> Iterator[GeneratedCase]:
+    """Generate the cases one at a time, so that a large corpus is never held
+    in memory at once.
+    """
+    for case in cases:
+        yield make_case(case, seed)
@@ -0,0 +1,322 @@
+"""
+Speed and accuracy benchmark of the solvers, with regression checks.
+
+`run` cracks a seeded corpus (see `decipher.benchmark.corpus`) across text
+lengths, key lengths and punctuation densities, with `hack_key(...)` and,
+for one-letter keys, the Caesar `crack_shift(...)`. A case succeeds when
+the plaintext comes back exactly. Every group of cases (by solver and text
+length, and by solver and key length) is summed up with its success rate,
+throughput, latency percentiles and peak memory, and everything is saved
+as JSON. `compare` checks a run against a stored baseline and exits with 1
+when a group got slower, bigger or less accurate.
+
+Example: -
+
+```bash
+python -m decipher.benchmark.solver run --output baseline.json
+# ... change the solver ...
+python -m decipher.benchmark.solver run --output current.json
+python -m decipher.benchmark.solver compare baseline.json current.json
+python -m decipher.benchmark.solver run --full  # texts of up to 10 MB
+```
+"""
+
+import sys
+import json
+import time
+import numpy
+import argparse
+import platform
+import tracemalloc
+
+from typing import Any, Callable, Dict, Final, List, Optional
+
+from decipher.utils.vig import ENGLISH_WORDS, MAX_KEY_LENGTH, hack_key
+from decipher.utils.batch import Deadline
+from decipher.utils.caesar import crack_shift
+from decipher.benchmark.corpus import GeneratedCase, generate, make_cases
+
+
+quick_sizes: Final = [100, 1_000, 10_000, 100_000]
+full_sizes: Final = [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+key_lengths: Final = [1, 2, 3, 5, 8, 12, MAX_KEY_LENGTH]
+punctuation: Final = [0.0, 0.2, 0.5]
+# Seconds before a case is given up on and counted as a failure.
+case_timeout: float = 10.0
+# Relative change of latency, throughput or memory that is a regression.
+tolerance: float = 0.25
+# Smaller changes of latency in seconds are noise, whatever the tolerance.
+min_latency_change: float = 0.002
+# Drop of the success rate that is a regression.
+max_success_drop: float = 0.02
+
+# A solver takes a ciphertext and a deadline, and returns the plaintext.
+Solver = Callable[[str, Deadline], Optional[str]]
+
+
+def solve_hack(ciphertext: str, deadline: Deadline) -> Optional[str]:
+    result = hack_key(ciphertext, cancelled=deadline)
+    return result.plaintext if result is not None else None
+
+
+def solve_caesar(ciphertext: str, deadline: Deadline) -> Optional[str]:
+    return crack_shift(ciphertext).plaintext
+
+
+solvers: Final[Dict[str, Solver]] = {"hack": solve_hack, "caesar": solve_caesar}
+
+
+def run_case(
+    generated: GeneratedCase, name: str, timeout: float = case_timeout, memory: bool = True
+) -> Dict[str, Any]:
+    """Crack one case with one solver.
+
+    Args:
+        generated (GeneratedCase): The case.
+        name (str): The solver, a key of `solvers`.
+        timeout (float, optional): Seconds allowed. Defaults to `case_timeout`.
+        memory (bool, optional): Crack a second time under tracemalloc to
+            find the peak memory use. Defaults to True.
+
+    Returns:
+        Dict[str, Any]: The settings of the case and how the solver did.
+    """
+    solver = solvers[name]
+    deadline = Deadline(timeout)
+    start = time.perf_counter()
+    plaintext = solver(generated.ciphertext, deadline)
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        solver(generated.ciphertext, Deadline(timeout))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "solver": name,
+        "size": generated.case.size,
+        "key_length": generated.case.key_length,
+        "punctuation": generated.case.punctuation,
+        "index": generated.case.index,
+        "seconds": seconds,
+        "success": plaintext == generated.plaintext,
+        "timeout": plaintext is None and deadline.is_set(),
+        "peak_bytes": peak,
+    }
+
+
+def summarize(cases: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Sum up the cases by solver and text length, and by solver and key length.
+
+    Args:
+        cases (List[Dict[str, Any]]): Cases as returned by `run_case(...)`.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Group name, like "hack size=1000", to its
+            success rate, throughput in bytes per second, latency
+            percentiles in seconds and peak memory in bytes.
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for field, label in (("size", "size"), ("key_length", "key")):
+        for case in sorted(cases, key=lambda case: (case["solver"] != "hack", case[field])):
+            groups.setdefault(f"{case['solver']} {label}={case[field]}", []).append(case)
+
+    summary = {}
+    for name, members in groups.items():
+        seconds = numpy.array([case["seconds"] for case in members])
+        peaks = [case["peak_bytes"] for case in members if case["peak_bytes"] is not None]
+        summary[name] = {
+            "cases": len(members),
+            "success_rate": sum(case["success"] for case in members) / len(members),
+            "throughput": sum(case["size"] for case in members) / max(seconds.sum(), 1e-9),
+            "p50": float(numpy.percentile(seconds, 50)),
+            "p90": float(numpy.percentile(seconds, 90)),
+            "p99": float(numpy.percentile(seconds, 99)),
+            "peak_bytes": max(peaks) if peaks else None,
+        }
+    return summary
+
+
+def run(
+    sizes: List[int],
+    key_lengths: List[int],
+    punctuation: List[float],
+    samples: int = 2,
+    seed: int = 0,
+    timeout: float = case_timeout,
+    memory: bool = True,
+    progress: Any = None,
+) -> Dict[str, Any]:
+    """Run the benchmark.
+
+    Args:
+        sizes (List[int]): Plaintext lengths in characters.
+        key_lengths (List[int]): Key lengths.
+        punctuation (List[float]): Punctuation densities.
+        samples (int, optional): Cases per combination. Defaults to 2.
+        seed (int, optional): Seed of the corpus. Defaults to 0.
+        timeout (float, optional): Seconds per case. Defaults to `case_timeout`.
+        memory (bool, optional): Measure the peak memory. Defaults to True.
+        progress (Any, optional): File to report every case to.
+
+    Returns:
+        Dict[str, Any]: The settings, every case and the summary.
+    """
+    # Loaded up front, so that the first case does not pay for it.
+    ENGLISH_WORDS.words
+
+    cases = []
+    for generated in generate(make_cases(sizes, key_lengths, punctuation, samples), seed):
+        names = ["hack"] + (["caesar"] if generated.case.key_length == 1 else [])
+        for name in names:
+            case = run_case(generated, name, timeout, memory)
+            cases.append(case)
+            if progress is not None:
+                print(
+                    f"{name:<7} size={case['size']:<9} key={case['key_length']:<3}"
+                    f" punctuation={case['punctuation']:<4} {case['seconds']:8.3f}s"
+                    f" {'ok' if case['success'] else 'FAILED'}",
+                    file=progress,
+                )
+
+    return {
+        "settings": {
+            "sizes": sizes,
+            "key_lengths": key_lengths,
+            "punctuation": punctuation,
+            "samples": samples,
+            "seed": seed,
+            "timeout": timeout,
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "machine": platform.machine(),
+        },
+        "cases": cases,
+        "summary": summarize(cases),
+    }
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = tolerance
+) -> List[str]:
+    """Find the groups that got worse since the baseline.
+
+    Args:
+        baseline (Dict[str, Any]): A saved `run(...)`.
+        current (Dict[str, Any]): A newer `run(...)`.
+        tolerance (float, optional): Relative change allowed. Defaults to `tolerance`.
+
+    Returns:
+        List[str]: One line per regression, empty if there is none.
+    """
+    regressions = []
+    for name, now in current["summary"].items():
+        before = baseline["summary"].get(name)
+        if before is None:
+            continue
+        if before["success_rate"] - now["success_rate"] > max_success_drop:
+            regressions.append(
+                f"{name}: success rate {before['success_rate']:.0%} -> {now['success_rate']:.0%}"
+            )
+        for percentile in ("p50", "p90"):
+            if (now[percentile] > before[percentile] * (1 + tolerance)
+                    and now[percentile] - before[percentile] > min_latency_change):
+                regressions.append(
+                    f"{name}: {percentile} {before[percentile]:.4f}s -> {now[percentile]:.4f}s"
+                )
+        if (now["throughput"] < before["throughput"] / (1 + tolerance)
+                and now["p50"] - before["p50"] > min_latency_change):
+            regressions.append(
+                f"{name}: throughput {before['throughput'] / 1e6:.3f} MB/s"
+                f" -> {now['throughput'] / 1e6:.3f} MB/s"
+            )
+        if (before["peak_bytes"] is not None and now["peak_bytes"] is not None
+                and now["peak_bytes"] > before["peak_bytes"] * (1 + tolerance)):
+            regressions.append(
+                f"{name}: peak memory {before['peak_bytes'] / 1e6:.1f} MB"
+                f" -> {now['peak_bytes'] / 1e6:.1f} MB"
+            )
+    return regressions
+
+
+def print_summary(results: Dict[str, Any], file: Any = None) -> None:
+    print(
+        f"{'group':<22} {'cases':>5} {'success':>8} {'MB/s':>9} {'p50 (s)':>9}"
+        f" {'p90 (s)':>9} {'p99 (s)':>9} {'peak MB':>8}",
+        file=file,
+    )
+    for name, group in results["summary"].items():
+        peak = "-" if group["peak_bytes"] is None else f"{group['peak_bytes'] / 1e6:.1f}"
+        print(
+            f"{name:<22} {group['cases']:>5} {group['success_rate']:>8.0%}"
+            f" {group['throughput'] / 1e6:>9.3f} {group['p50']:>9.4f} {group['p90']:>9.4f}"
+            f" {group['p99']:>9.4f} {peak:>8}",
+            file=file,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m decipher.benchmark.solver",
+        description="Benchmark the speed and accuracy of the decipher solvers.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark")
+    run_parser.add_argument("--output", "-o", metavar="PATH", help="save the results as JSON")
+    run_parser.add_argument("--full", action="store_true", help="also crack 1 MB and 10 MB texts")
+    run_parser.add_argument("--sizes", type=int, nargs="+", metavar="N", help="text lengths")
+    run_parser.add_argument(
+        "--key-lengths", type=int, nargs="+", default=key_lengths, metavar="N", help="key lengths"
+    )
+    run_parser.add_argument(
+        "--punctuation", type=float, nargs="+", default=punctuation, metavar="P",
+        help="punctuation densities",
+    )
+    run_parser.add_argument("--samples", type=int, default=2, help="cases per combination")
+    run_parser.add_argument("--seed", type=int, default=0, help="seed of the corpus")
+    run_parser.add_argument(
+        "--timeout", type=float, default=case_timeout, help="seconds allowed per case"
+    )
+    run_parser.add_argument("--no-memory", action="store_true", help="skip the memory runs")
+    run_parser.add_argument("--quiet", "-q", action="store_true", help="only print the summary")
+
+    compare_parser = commands.add_parser("compare", help="check a run against a baseline")
+    compare_parser.add_argument("baseline", help="JSON of the baseline run")
+    compare_parser.add_argument("current", help="JSON of the run to check")
+    compare_parser.add_argument(
+        "--tolerance", type=float, default=tolerance, help="relative change allowed"
+    )
+
+    args = parser.parse_args()
+    if args.command == "run":
+        results = run(
+            args.sizes or (full_sizes if args.full else quick_sizes),
+            args.key_lengths,
+            args.punctuation,
+            args.samples,
+            args.seed,
+            args.timeout,
+            memory=not args.no_memory,
+            progress=None if args.quiet else sys.stderr,
+        )
+        print_summary(results)
+        if args.output is not None:
+            with open(args.output, "w") as file:
+                json.dump(results, file, indent=2)
+    else:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        with open(args.current) as file:
+            current = json.load(file)
+        regressions = compare(baseline, current, args.tolerance)
+        for regression in regressions:
+            print(regression)
+        print(f"{len(regressions)} regressions")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Measures the startup cost of the decipher command line, per subcommand.
+
+Every subcommand is imported in a fresh interpreter with `-X importtime`, so
+the numbers are those of a cold `python -m decipher ...` call. A subcommand
+is the module `decipher.ui.cli` plus the modules its flag imports. Modules
+that are not installed are reported as missing instead of timed.
+
+Example: -
+
+```bash
+python -m decipher.benchmark.startup
+python -m decipher.benchmark.startup --repeat 5 --json
+```
+
+```
+subcommand       import (s)  modules
+crack                 0.112  decipher.ui.cli
+grammar               0.934  decipher.ui.cli, language_tool_python
+train                 2.410  decipher.ui.cli, decipher.experimental.model_v1, ...
+train-v2              1.230  decipher.ui.cli, decipher.utils.generator, ...
+generate              1.520  decipher.ui.cli, nltk, decipher.utils.generator
+```
+"""
+
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+from typing import Dict, Final, List, Optional, Tuple
+
+
+# The modules each subcommand imports on top of the CLI itself, see the
+# check_*() methods of decipher.ui.cli.DecipherParserThread.
+subcommands: Final[Dict[str, List[str]]] = {
+    "crack": [],
+    "grammar": ["language_tool_python"],
+    "train": ["decipher.utils.generator", "decipher.experimental.model_v1"],
+    "train-v2": ["decipher.utils.generator", "decipher.experimental.model_v2"],
+    "predict": ["decipher.utils.loader"],
+    "generate": ["nltk", "decipher.utils.generator"],
+}
+cli_module: Final = "decipher.ui.cli"
+
+
+def import_time(modules: List[str]) -> Tuple[Optional[float], Dict[str, float]]:
+    """Import `modules` in a fresh interpreter and time them.
+
+    Args:
+        modules (List[str]): Modules to import, in order.
+
+    Returns:
+        Tuple[Optional[float], Dict[str, float]]: The total import time in
+            seconds (None if a module is missing) and the cumulative time of
+            every module of `modules`, the interpreter's own startup imports
+            are left out.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "".join(f"import {module};" for module in modules)],
+        capture_output=True, text=True,
+    )
+    # Lines look like "import time:   self [us] | cumulative | imported package".
+    times: Dict[str, float] = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and name.strip() in modules:
+            times[name.strip()] = int(cumulative) / 1e6
+    if process.returncode != 0:
+        return None, times
+    return sum(times.values()), times
+
+
+def run(names: List[str], repeat: int = 3) -> Dict[str, Dict]:
+    """Measure the import cost of subcommands, the median of `repeat` runs.
+
+    Args:
+        names (List[str]): Subcommands of `subcommands` to measure.
+        repeat (int, optional): Runs per subcommand. Defaults to 3.
+
+    Returns:
+        Dict[str, Dict]: For every subcommand its modules, the median total
+            import time in seconds (None when a module is missing) and the
+            median time of each of its modules.
+    """
+    results: Dict[str, Dict] = {}
+    for name in names:
+        modules = [cli_module] + subcommands[name]
+        runs = [import_time(modules) for _ in range(repeat)]
+        totals = [total for total, _ in runs if total is not None]
+        results[name] = {
+            "modules": modules,
+            "seconds": statistics.median(totals) if len(totals) == repeat else None,
+            "imports": {
+                module: statistics.median(times.get(module, 0.0) for _, times in runs)
+                for module in runs[0][1]
+            },
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m decipher.benchmark.startup",
+        description="Measure the import cost of each decipher subcommand.",
+    )
+    parser.add_argument(
+        "subcommands", nargs="*", metavar="SUBCOMMAND",
+        help=f"subcommands to measure, any of {', '.join(subcommands)} (default all)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per subcommand")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+    unknown = set(args.subcommands) - set(subcommands)
+    if unknown:
+        parser.error(f"unknown subcommands: {', '.join(sorted(unknown))}")
+
+    results = run(args.subcommands or list(subcommands), args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'subcommand':<16} {'import (s)':>10}  modules")
+    for name, result in results.items():
+        seconds = "missing" if result["seconds"] is None else f"{result['seconds']:.3f}"
+        print(f"{name:<16} {seconds:>10}  {', '.join(result['modules'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ import sklearn.tree
 import sklearn.preprocessing
 import sklearn.feature_extraction.text
 
+import decipher.utils.storage as storage
+
 from typing import Any, Final, List, Tuple
 
 numpy.random.seed(0)
@@ -21,7 +23,7 @@ numpy.random.seed(0)
 class DecipherDataFrame(object):
     def __init__(self, path: str, total_classes: int, total_keys: int) -> None:
         super().__init__()
-        self.dataframe = pandas.read_csv(path)
+        self.dataframe = storage.read(path)
         self.dataframe.columns = ["source", "key", "converted"]
 
         # Checking for null value and removing rows with null value
@@ -0,0 +1,214 @@
+"""
+Out-of-core training of the decipher model, a chunk of the dataset at a time.
+
+`model_v1` loads the whole dataset, fits a `TfidfVectorizer` over all of it
+and fits a decision tree in one go, so it needs memory for all of it. Here
+the dataset is streamed in chunks of `chunk_size` rows (CSV or Parquet, see
+`decipher.utils.storage`). Every chunk is turned into features by a
+`HashingVectorizer`, which needs no fitting, and fed to an estimator with
+`partial_fit(...)`. Every row goes either to training or to the held-out
+test stream by a hash of its source word and key, like the per-row
+`train_test_split(...)` of `model_v1`, so the split is the same on every
+run without keeping any row indexes. Every word keeps most of its keys
+for training, the test stream scores the model on the others. Memory is
+bounded by the chunk size and by the model (classes times features),
+never by the dataset.
+
+Example: -
+
+```python
+from decipher.experimental.model_v2 import StreamingDecipherModel
+
+model = StreamingDecipherModel(max_classes=1000)
+model.train(".decipher/dataset/data.parquet", chunk_size=100_000)
+model.save()
+
+model.run(["bqqmf"])  # the source words, like ["apple"]
+```
+"""
+
+from __future__ import annotations
+
+import numpy
+import pickle
+import pandas
+
+import sklearn.metrics
+import sklearn.naive_bayes
+import sklearn.feature_extraction.text
+
+import decipher.utils.storage as storage
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# Rows read and learned from at a time.
+chunk_size: int = 100_000
+# Hashed features of a cipher text, the model holds classes times features.
+n_features: int = 2 ** 12
+# Share of the rows held out for testing.
+test_size: float = 0.3
+
+
+def shift_invariant(text: str) -> str:
+    """Replace every letter of a word by its distance to the next letter.
+    All the Caesar shifts of a word give the same result, so a word is
+    recognised under keys it was never seen with.
+
+    Args:
+        text (str): The cipher text.
+
+    Returns:
+        str: One lowercase letter per pair of letters, a space between words.
+    """
+    letters = [ord(letter) for letter in text.lower() if "a" <= letter <= "z" or letter == " "]
+    return "".join(
+        " " if first == 32 or second == 32 else chr(ord("a") + (second - first) % 26)
+        for first, second in zip(letters, letters[1:])
+    )
+
+
+class StreamingDecipherModel(object):
+    """Learns the source word of a cipher text from a dataset too big for
+    memory.
+
+    Args:
+        max_classes (Optional[int], optional): Learn only the first this many
+            source words of the dataset, all of them if None. Defaults to 1000.
+        n_features (int, optional): Hashed features. Defaults to `n_features`.
+        estimator (Any, optional): A classifier with `partial_fit(...)`.
+            Defaults to a `MultinomialNB`.
+    """
+
+    model_file: str = "model_v2.pkl"
+
+    def __init__(
+        self, max_classes: Optional[int] = 1000, n_features: int = n_features, estimator: Any = None
+    ) -> None:
+        super().__init__()
+        self.max_classes = max_classes
+        # Character n-grams of the shift invariant cipher text, hashed
+        # without any state.
+        self.encrypted_encoder = sklearn.feature_extraction.text.HashingVectorizer(
+            preprocessor=shift_invariant,
+            analyzer="char_wb",
+            ngram_range=(1, 3),
+            n_features=n_features,
+            alternate_sign=False,
+        )
+        self.estimator = estimator if estimator is not None else sklearn.naive_bayes.MultinomialNB(
+            alpha=0.01
+        )
+        self.classes: Optional[numpy.ndarray] = None
+
+    def find_classes(self, path: str, chunk_size: int = chunk_size) -> numpy.ndarray:
+        """Stream the source words of the dataset, stopping once
+        `max_classes` distinct ones are found.
+
+        Args:
+            path (str): A `.csv` or `.parquet` dataset.
+            chunk_size (int, optional): Rows per chunk. Defaults to `chunk_size`.
+
+        Returns:
+            numpy.ndarray: The classes, sorted.
+        """
+        classes: Dict[str, None] = {}
+        for chunk in storage.iter_chunks(path, chunk_size, columns=["source"]):
+            classes.update(dict.fromkeys(chunk["source"].astype(str).unique()))
+            if self.max_classes is not None and len(classes) >= self.max_classes:
+                break
+        return numpy.array(sorted(list(classes)[:self.max_classes]), dtype=object)
+
+    @staticmethod
+    def held_out(chunk: pandas.DataFrame, test_size: float = test_size) -> numpy.ndarray:
+        """Tell the rows of the test stream, by a hash of their source word
+        and key.
+
+        Returns:
+            numpy.ndarray: True for every row held out for testing.
+        """
+        # The key is int8 in Parquet and int64 in CSV, hashed the same way.
+        rows = pandas.DataFrame({
+            "source": chunk["source"].astype(str), "key": chunk["key"].astype("int64"),
+        })
+        hashes = pandas.util.hash_pandas_object(rows, index=False)
+        return (hashes.to_numpy() % 1000) < test_size * 1000
+
+    def chunks(
+        self, path: str, chunk_size: int = chunk_size, test: bool = False
+    ) -> Iterator[Tuple[Any, numpy.ndarray]]:
+        """Stream the features and labels of the training or test rows of
+        the learned classes.
+
+        Yields:
+            Iterator[Tuple[Any, numpy.ndarray]]: A sparse matrix of the
+                features and the labels, per chunk.
+        """
+        for chunk in storage.iter_chunks(path, chunk_size, columns=["source", "key", "converted"]):
+            sources = chunk["source"].astype(str)
+            rows = (self.held_out(chunk) == test) & sources.isin(self.classes).to_numpy()
+            if rows.any():
+                yield (
+                    self.encrypted_encoder.transform(chunk["converted"].astype(str)[rows]),
+                    sources[rows].to_numpy(dtype=object),
+                )
+
+    def train(self, path: str, chunk_size: int = chunk_size, epochs: int = 1) -> Dict[str, float]:
+        """Learn from the training stream, then score on the test stream.
+
+        Args:
+            path (str): A `.csv` or `.parquet` dataset.
+            chunk_size (int, optional): Rows per chunk. Defaults to `chunk_size`.
+            epochs (int, optional): Passes over the training stream. Defaults to 1.
+
+        Returns:
+            Dict[str, float]: See `evaluate(...)`.
+        """
+        self.classes = self.find_classes(path, chunk_size)
+        print(f"Learning {len(self.classes)} classes")
+        for epoch in range(epochs):
+            rows = 0
+            for x, y in self.chunks(path, chunk_size):
+                self.estimator.partial_fit(x, y, classes=self.classes)
+                rows += len(y)
+            print(f"Epoch {epoch + 1}, learned from {rows} rows")
+        return self.evaluate(path, chunk_size)
+
+    def evaluate(self, path: str, chunk_size: int = chunk_size) -> Dict[str, float]:
+        """Score on the test stream, counting per class so that no
+        prediction is kept.
+
+        Returns:
+            Dict[str, float]: The `rows`, `accuracy` and weighted `f1_score`.
+        """
+        classes = len(self.classes)
+        true_positives = numpy.zeros(classes)
+        predicted = numpy.zeros(classes)
+        actual = numpy.zeros(classes)
+        for x, y in self.chunks(path, chunk_size, test=True):
+            y_prediction = self.estimator.predict(x)
+            y_index = numpy.searchsorted(self.classes, y)
+            prediction_index = numpy.searchsorted(self.classes, y_prediction)
+            hits = y_index == prediction_index
+            true_positives += numpy.bincount(y_index[hits], minlength=classes)
+            predicted += numpy.bincount(prediction_index, minlength=classes)
+            actual += numpy.bincount(y_index, minlength=classes)
+
+        rows = actual.sum()
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            f1_scores = numpy.nan_to_num(2 * true_positives / (predicted + actual))
+        accuracy = float(true_positives.sum() / rows) if rows else 0.0
+        f1_score = float((f1_scores * actual).sum() / rows) if rows else 0.0
+        print(f"Accuracy {round(accuracy, 2)}, F1-Score {round(f1_score, 2)}")
+        return {"rows": float(rows), "accuracy": accuracy, "f1_score": f1_score}
+
+    def save(self) -> None:
+        with open(self.model_file, "wb") as file:
+            pickle.dump(self, file)
+
+    def load(self) -> StreamingDecipherModel:
+        with open(self.model_file, "rb") as file:
+            return pickle.load(file)
+
+    def run(self, encrypted_texts: List[str]) -> List[str]:
+        return list(self.estimator.predict(self.encrypted_encoder.transform(encrypted_texts)))
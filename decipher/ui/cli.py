@@ -1,26 +1,32 @@
+"""
+The command line interface of decipher.
+
+Only what a plain crack needs is imported up front. The heavy dependencies
+are imported by the method of the flag that needs them: LanguageTool (and
+its Java server) for `--check-grammar`, nltk and the dataset generator for
+`--generate-dataset`, and scikit-learn and `model_v1` for `--train-model`
+and prediction. Run `python -m decipher.benchmark.startup` to
+measure the startup cost of each of them.
+"""
+
 import sys
-import nltk
-import ctypes
+import time
 import argparse
-import itertools
-
-import multiprocessing as mp
-import decipher.utils.generator as gen
 
-from typing import Any, Final, Optional
+from typing import Any, Final, List, Optional, Tuple
 from argparse import Namespace
 from dataclasses import dataclass
-from decipher.utils.generator import dataset_filename
 from decipher.utils.snips import Singleton
-from decipher.utils.loader import DecipherModelLoader
-from decipher.experimental.model_v1 import DecipherModel
-from decipher.utils.vig import hack
-from multiprocessing.managers import ValueProxy
-from caesarcipher import CaesarCipher
+from decipher.utils.vig import ENGLISH_WORDS, HackResult, hack_anytime, hack_key
+from decipher.utils.fitness import QuadgramScorer
+from decipher.utils.stream import crack_file
+from decipher.utils.batch import crack_files
+from decipher.utils.grammar import GrammarCorrector
+from decipher.utils.caesar import crack, crack_shift
+from decipher.utils.cache import ResultCache, default_cache_path
 
-import language_tool_python
-
-tool: Final = language_tool_python.LanguageTool("en-US")
+import decipher.utils.profiling as profiling
+from decipher.ui.server import DecipherClient, client_errors, default_address, max_timeout, serve
 
 
 @dataclass
@@ -58,6 +64,9 @@ class ArgConfigSchema:
             action (Optional[str]): Callback when argument executed.
             metavar (Optional[str]): The meta variable to store the value.
             type (Any): The type of the argument value (optional).
+            nargs (Optional[str]): Number of values the argument takes (optional).
+            choices (Optional[List[str]]): The allowed values (optional).
+            default (Any): The value when the argument is not given (optional).
         """
 
         help: str
@@ -66,6 +75,9 @@ class ArgConfigSchema:
         action: Optional[str] = None
         metavar: Optional[str] = None
         type: Any = None
+        nargs: Optional[str] = None
+        choices: Optional[List[str]] = None
+        default: Any = None
 
     config: ArgDetails
 
@@ -117,8 +129,31 @@ class DecipherParserThread(argparse.ArgumentParser, metaclass=Singleton):
                 short_arg="-t",
                 long_arg="--train-model",
                 action="store_true",
-                # TODO: change this to support multi-model support
-                help="train the model (uses model_v1)",
+                help="train the model chosen by --model",
+            ),
+        ),
+        ArgConfigSchema(
+            name="model",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-m",
+                long_arg="--model",
+                action=None,
+                metavar="MODEL",
+                type=str,
+                choices=["v1", "v2"],
+                default="v1",
+                help="model to train, v2 streams the dataset in chunks and needs far less memory",
+            ),
+        ),
+        ArgConfigSchema(
+            name="chunk_size",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-cs",
+                long_arg="--chunk-size",
+                action=None,
+                metavar="ROWS",
+                type=int,
+                help="rows of the dataset the v2 model learns from at a time",
             ),
         ),
         ArgConfigSchema(
@@ -132,10 +167,46 @@ class DecipherParserThread(argparse.ArgumentParser, metaclass=Singleton):
                 help="specify the word list file, default is nltk.corpus",
             ),
         ),
+        ArgConfigSchema(
+            name="dataset_format",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-df",
+                long_arg="--dataset-format",
+                action=None,
+                metavar="FORMAT",
+                type=str,
+                choices=["csv", "parquet"],
+                default="csv",
+                help="generate and train from a csv or a parquet dataset, parquet needs pyarrow",
+            ),
+        ),
+        ArgConfigSchema(
+            name="batch_size",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-bs",
+                long_arg="--batch-size",
+                action=None,
+                metavar="WORDS",
+                type=int,
+                help="words per task of --generate-dataset, idle --workers take the next one",
+            ),
+        ),
         ArgConfigSchema(
             name="boost",
             config=ArgConfigSchema.ArgDetails(
-                short_arg="-b", long_arg="--boost", action="store_true", help="",
+                short_arg="-b",
+                long_arg="--boost",
+                action="store_true",
+                help="crack a Caesar cipher, all 26 shifts are scored at once",
+            ),
+        ),
+        ArgConfigSchema(
+            name="auto",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-A",
+                long_arg="--auto",
+                action="store_true",
+                help="tell a Caesar from a Vigenère cipher and crack either",
             ),
         ),
         ArgConfigSchema(
@@ -160,6 +231,176 @@ class DecipherParserThread(argparse.ArgumentParser, metaclass=Singleton):
                 help="specify the text 🅰 to crack 🔑",
             ),
         ),
+        ArgConfigSchema(
+            name="dictionary",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-d",
+                long_arg="--dictionary",
+                action=None,
+                metavar="PATH",
+                type=str,
+                help="specify the English word list used to recognise plaintext",
+            ),
+        ),
+        ArgConfigSchema(
+            name="quadgrams",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-q",
+                long_arg="--quadgrams",
+                action="store_true",
+                help="recognise plaintext by quadgram fitness instead of words",
+            ),
+        ),
+        ArgConfigSchema(
+            name="workers",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-j",
+                long_arg="--workers",
+                action=None,
+                metavar="N",
+                type=int,
+                help="number of worker processes used to crack 🔑, default is 1",
+            ),
+        ),
+        ArgConfigSchema(
+            name="stream",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-s",
+                long_arg="--stream",
+                action="store_true",
+                help="crack a large --input-file in chunks, the key is found from its start",
+            ),
+        ),
+        ArgConfigSchema(
+            name="output",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-o",
+                long_arg="--output",
+                action=None,
+                metavar="PATH",
+                type=str,
+                help="write the cracked text to a file instead of the screen",
+            ),
+        ),
+        ArgConfigSchema(
+            name="batch",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-B",
+                long_arg="--batch",
+                action=None,
+                metavar="PATH",
+                type=str,
+                nargs="+",
+                help="crack many files, directories, globs or @manifest files, "
+                "one JSON line per file",
+            ),
+        ),
+        ArgConfigSchema(
+            name="timeout",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-T",
+                long_arg="--timeout",
+                action=None,
+                metavar="SECONDS",
+                type=float,
+                help="give up on a --batch file or --serve request after this many seconds",
+            ),
+        ),
+        ArgConfigSchema(
+            name="time_budget",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-tb",
+                long_arg="--time-budget",
+                action=None,
+                metavar="SECONDS",
+                type=float,
+                help="stop cracking after this many seconds and print the best guess so far",
+            ),
+        ),
+        ArgConfigSchema(
+            name="max_candidates",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-mc",
+                long_arg="--max-candidates",
+                action=None,
+                metavar="N",
+                type=int,
+                help="stop cracking after trying this many keys and print the best guess so far",
+            ),
+        ),
+        ArgConfigSchema(
+            name="top_k",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-k",
+                long_arg="--top-k",
+                action=None,
+                metavar="K",
+                type=int,
+                help="print the K most likely keys and plaintexts, best first",
+            ),
+        ),
+        ArgConfigSchema(
+            name="serve",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-S",
+                long_arg="--serve",
+                action="store_true",
+                help="run a daemon that keeps everything loaded, cracks are forwarded to it",
+            ),
+        ),
+        ArgConfigSchema(
+            name="address",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-a",
+                long_arg="--address",
+                action=None,
+                metavar="ADDRESS",
+                type=str,
+                help="HOST:PORT or Unix socket path of the --serve daemon",
+            ),
+        ),
+        ArgConfigSchema(
+            name="no_cache",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-nc",
+                long_arg="--no-cache",
+                action="store_true",
+                help="always crack and replace the cached key, --serve keeps no cache",
+            ),
+        ),
+        ArgConfigSchema(
+            name="profile",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-p",
+                long_arg="--profile",
+                action="store_true",
+                help="print the time of every cracking stage and the work counters",
+            ),
+        ),
+        ArgConfigSchema(
+            name="profile_format",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-pf",
+                long_arg="--profile-format",
+                action=None,
+                metavar="FORMAT",
+                type=str,
+                choices=["table", "json"],
+                default="table",
+                help="print the --profile report as a table or as json",
+            ),
+        ),
+        ArgConfigSchema(
+            name="profile_dump",
+            config=ArgConfigSchema.ArgDetails(
+                short_arg="-pd",
+                long_arg="--profile-dump",
+                action=None,
+                metavar="PATH",
+                type=str,
+                help="also write cProfile stats to PATH.pstats and memory use to PATH.memory.txt",
+            ),
+        ),
         ArgConfigSchema(
             name="check_grammar",
             config=ArgConfigSchema.ArgDetails(
@@ -194,44 +435,195 @@ class DecipherParserThread(argparse.ArgumentParser, metaclass=Singleton):
                     help=arg.config.help,
                     type=arg.config.type,
                     metavar=arg.config.metavar,
+                    nargs=arg.config.nargs,
+                    choices=arg.config.choices,
+                    default=arg.config.default,
                 )
 
         self.args: Namespace = self.parse_args(sys.argv[1:])
 
         self.verbose: bool = bool(self.args.verbose)
 
+        if self.args.dictionary is not None:
+            ENGLISH_WORDS.use(self.args.dictionary)
+
         self.check_generate_dataset_arg_thread()
-        if not self.args.boost:
-            print("Vig")
+        if self.args.profile or self.args.profile_dump is not None:
+            with profiling.session(self.args.profile_dump) as profiler:
+                self.check_crack()
+            profiling.print_report(profiler, self.args.profile_format)
+        else:
+            self.check_crack()
+        self.check_train()
+
+    def check_crack(self) -> None:
+        if self.args.serve:
+            serve(
+                self.args.address or default_address,
+                timeout=self.args.timeout or max_timeout,
+                cache=not self.args.no_cache,
+                verbose=self.verbose,
+            )
+        elif self.args.batch is not None:
+            self.check_batch()
+        elif self.args.input is None and self.args.input_file is None:
+            pass  # nothing to crack, e.g. only training
+        elif not self.args.boost:
+            print("Auto" if self.args.auto else "Vig")
             self.check_input_for_vig()
         else:
             print("Caser")
             self.check_input_for_caser()
-        self.check_train()
 
     def check_input_for_vig(self) -> None:
+        workers: Final = self.args.workers or 1
+        scorer: Final = QuadgramScorer() if self.args.quadgrams else None
+        if self.args.stream and self.args.input_file is not None:
+            result = crack_file(
+                self.args.input_file, self.args.output, workers=workers, scorer=scorer
+            )
+            if result is None:
+                print("Found no key!")
+            elif self.verbose:
+                print(f"Key {result.key}", file=sys.stderr)
+            return
+
         if self.args.input_file is not None:
-            if self.args.check_grammar:
-                print("Auto correct grammar...")
-                print(tool.correct(hack(open(self.args.input_file).read())))
-            else:
-                print(hack(open(self.args.input_file).read()))
+            text = open(self.args.input_file).read()
         else:
-            if self.args.check_grammar:
-                print("Auto correct grammar...")
-                print(tool.correct(hack(self.args.input)))
-            else:
-                print(hack(self.args.input))
+            text = self.args.input
+
+        if (self.args.time_budget is not None or self.args.max_candidates is not None
+                or self.args.top_k is not None):
+            self.check_anytime(text, scorer)
+            return
+
+        # The daemon has the default word list, a single worker and its own
+        # cache and profiling, only forward what it would crack the same way.
+        if (self.args.dictionary is None and workers == 1 and not self.args.no_cache
+                and not self.args.profile and self.args.profile_dump is None):
+            client: Final = DecipherClient(self.args.address or default_address)
+            if client.running():
+                if self.verbose:
+                    print("Forwarding to the daemon", file=sys.stderr)
+                try:
+                    response = client.crack(
+                        text,
+                        auto=bool(self.args.auto),
+                        quadgrams=bool(self.args.quadgrams),
+                        grammar=bool(self.args.check_grammar),
+                        timeout=self.args.timeout,
+                    )
+                except client_errors as error:
+                    response = {"status": "error", "error": str(error)}
+                if response.get("status") in ("ok", "no-key", "timeout"):
+                    if self.verbose and "grammar_seconds" in response:
+                        print(
+                            f"Corrected grammar in {response['grammar_seconds']:.2f}s",
+                            file=sys.stderr,
+                        )
+                    print(response.get("plaintext"))
+                    return
+                # Busy, broken or too slow, crack here instead.
+                if self.verbose:
+                    print(
+                        f"The daemon failed ({response.get('error') or response.get('status')}),"
+                        " cracking here",
+                        file=sys.stderr,
+                    )
+
+        def solve(ciphertext: Any) -> Tuple[Optional[str], Optional[HackResult]]:
+            if self.args.auto:
+                return crack(ciphertext, scorer=scorer, workers=workers)
+            return "vigenere", hack_key(ciphertext, workers=workers, scorer=scorer)
+
+        start = time.perf_counter()
+        cache: Final = ResultCache()
+        cipher, result = cache.crack(text, solve, refresh=bool(self.args.no_cache))
+        profiling.active.count("cache hits", cache.hits)
+        profiling.active.count("cache misses", cache.misses)
+        plaintext = result.plaintext if result is not None else None
+        if self.verbose:
+            if result is not None:
+                print(f"{cipher.capitalize()} key {result.key}", file=sys.stderr)
+            print(f"Cache hits {cache.hits}, misses {cache.misses}", file=sys.stderr)
+            print(f"Cracked in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+        if self.args.check_grammar and plaintext is not None:
+            print("Auto correct grammar...")
+            corrector = GrammarCorrector()
+            with profiling.active.stage("grammar"):
+                plaintext = corrector.correct(plaintext)
+            if self.verbose:
+                print(f"Corrected grammar in {corrector.seconds:.2f}s", file=sys.stderr)
+        print(plaintext)
+
+    def check_anytime(self, text: str, scorer: Optional[QuadgramScorer]) -> None:
+        """Crack within `--time-budget` or `--max-candidates` and print the
+        `--top-k` best keys, even if none of them reads as English. Nothing is
+        cached or forwarded to the daemon, as the answer may be a guess.
+        """
+        top_k: Final = self.args.top_k or 1
+        start = time.perf_counter()
+        candidates = hack_anytime(
+            text,
+            timeBudget=self.args.time_budget,
+            maxCandidates=self.args.max_candidates,
+            topK=top_k,
+            scorer=scorer,
+        )
+        if self.verbose:
+            print(f"Cracked in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        if not candidates:
+            print("Found no key!")
+            return
+        if not any(candidate.english for candidate in candidates):
+            print("Found no English plaintext, printing the best guess", file=sys.stderr)
+        for rank, candidate in enumerate(candidates, start=1):
+            if top_k > 1 or self.verbose:
+                print(
+                    f"{rank}. Key {candidate.key}, confidence {candidate.confidence:.2f}"
+                    + ("" if candidate.english else ", guessed"),
+                    file=sys.stderr if top_k == 1 else sys.stdout,
+                )
+            print(candidate.plaintext)
+
+    def check_batch(self) -> None:
+        workers: Final = self.args.workers or 1
+        options: Final = {
+            "scorer": QuadgramScorer() if self.args.quadgrams else None,
+            "cache": default_cache_path,
+            "refresh": bool(self.args.no_cache),
+        }
+        if self.args.output is not None:
+            with open(self.args.output, "w") as output:
+                cracked = crack_files(
+                    self.args.batch, output, workers, self.args.timeout, **options
+                )
+        else:
+            cracked = crack_files(
+                self.args.batch, sys.stdout, workers, self.args.timeout, **options
+            )
+        if self.verbose:
+            print(f"Cracked {cracked} files", file=sys.stderr)
 
     def check_input_for_caser(self) -> None:
         if self.args.input_file is not None:
-            print(CaesarCipher(open(self.args.input_file).read()).cracked)
+            result = crack_shift(open(self.args.input_file).read())
         else:
-            print(CaesarCipher(self.args.input).cracked)
+            result = crack_shift(self.args.input)
+        if self.verbose:
+            print(f"Key {result.key}", file=sys.stderr)
+        print(result.plaintext)
 
     def check_train(self) -> None:
-        if self.args.train_model:
-            path: Final = f".decipher/dataset/{dataset_filename}"
+        if self.args.train_model and self.args.model == "v2":
+            self.check_train_streaming()
+        elif self.args.train_model:
+            from decipher.utils.generator import dataset_file
+            from decipher.experimental.model_v1 import DecipherModel
+
+            path: Final = dataset_file(self.args.dataset_format)
             print(f"Started training from dataset {path}")
             model = DecipherModel()
             print(f"Pickling to {model.model_file}")
@@ -245,8 +637,21 @@ class DecipherParserThread(argparse.ArgumentParser, metaclass=Singleton):
             )
             model.save()
 
+    def check_train_streaming(self) -> None:
+        from decipher.utils.generator import dataset_file
+        from decipher.experimental.model_v2 import StreamingDecipherModel, chunk_size
+
+        path: Final = dataset_file(self.args.dataset_format)
+        print(f"Started streaming training from dataset {path}")
+        model = StreamingDecipherModel(max_classes=1000)
+        print(f"Pickling to {model.model_file}")
+        model.train(path, chunk_size=self.args.chunk_size or chunk_size)
+        model.save()
+
     def check_input(self) -> None:
         if self.args.input is not None or self.args.input_file is not None:
+            from decipher.utils.loader import DecipherModelLoader
+
             loader = DecipherModelLoader()
             result = loader.load()
             if result is not None:
@@ -265,7 +670,8 @@ class DecipherParserThread(argparse.ArgumentParser, metaclass=Singleton):
         """Checks if the user asked to generate the default dataset. (Thread-ready)
         """
         if self.args.generate_dataset:
-            mgr: Final = mp.Manager()
+            import nltk
+            import decipher.utils.generator as gen
 
             print(
                 "Using nltk corpus"
@@ -274,18 +680,13 @@ class DecipherParserThread(argparse.ArgumentParser, metaclass=Singleton):
             )
 
             gen.make()
-            keys: Final = [list(range(0, 100))] * gen.threads
-            corpus_words: Final = gen.split(
-                list(nltk.corpus.words.words())
+            path: Final = gen.generate(
+                nltk.corpus.words.words()
                 if self.args.word_list is None
-                else list(set(open(self.args.word_list).read().split())),
-                splits=gen.threads,
+                else sorted(set(open(self.args.word_list).read().split())),
+                keys=range(0, 100),
+                processes=self.args.workers or gen.threads,
+                format=self.args.dataset_format,
+                batch_size=self.args.batch_size or gen.batch_size,
             )
-
-            thread_id: ValueProxy = mgr.Value(ctypes.c_int, 0)
-
-            with mp.Pool(gen.threads) as pool:
-                pool.starmap(
-                    gen.generate_thread,
-                    zip(corpus_words, itertools.repeat(thread_id), keys),
-                )
+            print(f"Saved {path}")
@@ -0,0 +1,411 @@
+"""
+A long-running decipher daemon and the client that forwards to it.
+
+The daemon loads the word list, the quadgram table, the grammar tool and
+the trained model once and then answers requests over localhost HTTP or a
+Unix socket, so a request only pays for the crack itself. At most
+`max_requests` requests are worked on at a time, the others wait up to
+`queue_timeout` seconds and are turned away with 503 after that. A crack
+gives up after the `timeout` of its request, at most `max_timeout`.
+
+Endpoints: -
+
+- `GET /health`: `{"status": "ok", "cache": {"hits": 0, "misses": 0}}`
+- `POST /crack` with `{"text": ..., "auto": false, "quadgrams": false,
+  "grammar": false, "timeout": 30}`: `{"status": "ok", "cipher": "vigenere",
+  "key": ..., "plaintext": ..., "score": ...}`, the status is `no-key` or
+  `timeout` when no key was found. `cached` tells if the key came from the
+  result cache. With `auto` a Caesar cipher is told
+  apart from a Vigenère cipher first, see `decipher.utils.caesar`. With `grammar` the time
+  spent correcting is given as `grammar_seconds`.
+- `POST /decode` with `{"text": ...}`: `{"status": "ok", "plaintext": ...}`
+  decoded by the trained model.
+
+Example: -
+
+```bash
+python -m decipher --serve  # on the default address
+python -m decipher --input "Encrypted text here"  # forwarded to the daemon
+```
+
+```python
+from decipher.ui.server import DecipherClient
+
+client = DecipherClient("127.0.0.1:8419")
+if client.running():
+    print(client.crack("Encrypted text here")["plaintext"])
+```
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+import http.client
+import http.server
+import socketserver
+
+from typing import Any, Dict, Final, Optional, Tuple, Union
+
+from decipher.utils.vig import ENGLISH_WORDS, hack_key
+from decipher.utils.cache import ResultCache
+from decipher.utils.caesar import crack
+from decipher.utils.batch import Deadline
+from decipher.utils.fitness import QuadgramScorer
+from decipher.utils.grammar import GrammarCorrector
+
+
+def default_socket_path() -> str:
+    """The Unix socket of the daemon, the same from any working directory:
+    in `$XDG_RUNTIME_DIR/decipher/` if set, in `~/.decipher/` otherwise.
+
+    Returns:
+        str: The absolute path of the socket.
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    directory = os.path.join(runtime, "decipher") if runtime else os.path.join(
+        os.path.expanduser("~"), ".decipher"
+    )
+    return os.path.abspath(os.path.join(directory, "decipher.sock"))
+
+
+# Unix socket where supported, localhost HTTP otherwise. DECIPHER_SERVER
+# overrides it.
+default_address: str = os.environ.get(
+    "DECIPHER_SERVER",
+    default_socket_path() if hasattr(socket, "AF_UNIX") else "127.0.0.1:8419",
+)
+# Requests worked on at the same time.
+max_requests: int = 4
+# Seconds a request waits for a free slot before it is turned away.
+queue_timeout: float = 5.0
+# Seconds a crack may take, requests can ask for less but not for more.
+max_timeout: float = 60.0
+# Largest request body accepted, in bytes.
+max_body_size: int = 16 * 1024 * 1024
+# Seconds the client waits on top of the crack timeout, for a free slot and
+# for the grammar correction, before it gives up on the daemon.
+response_slack: float = queue_timeout + 30.0
+# What a request to a daemon that is gone, stuck or broken raises.
+client_errors: Final = (OSError, ValueError, http.client.HTTPException)
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """Tell a `host:port` address from a Unix socket path.
+
+    Args:
+        address (str): `host:port` or the path of a Unix socket.
+
+    Returns:
+        Union[str, Tuple[str, int]]: `(host, port)` or the socket path.
+    """
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+class DecipherService(object):
+    """Everything the daemon keeps loaded, and the requests it can answer.
+    The grammar tool and the model are loaded on their first request.
+
+    Args:
+        timeout (float, optional): Longest crack in seconds. Defaults to `max_timeout`.
+        cache (bool, optional): Keep cracked keys in a `ResultCache`. Defaults to True.
+    """
+
+    def __init__(self, timeout: float = max_timeout, cache: bool = True) -> None:
+        super().__init__()
+        self.timeout = timeout
+        self.cache = ResultCache() if cache else None
+        self.scorer = QuadgramScorer()
+        self.corrector = GrammarCorrector()
+        self.__model: Any = None
+        self.__lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Load the word list and the quadgram table up front."""
+        ENGLISH_WORDS.words
+        self.scorer.table
+
+    @property
+    def model(self) -> Any:
+        """The trained `DecipherModel`, None if there is none."""
+        with self.__lock:
+            if self.__model is None:
+                from decipher.utils.loader import DecipherModelLoader
+
+                result = DecipherModelLoader().load()
+                self.__model = result[0] if result is not None else False
+        return self.__model or None
+
+    def crack(
+        self,
+        text: str,
+        auto: bool = False,
+        quadgrams: bool = False,
+        grammar: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        deadline = Deadline(min(timeout or self.timeout, self.timeout))
+        scorer = self.scorer if quadgrams else None
+
+        def solve(ciphertext: Any) -> Tuple[Optional[str], Any]:
+            if auto:
+                return crack(ciphertext, scorer=scorer, cancelled=deadline)
+            return "vigenere", hack_key(ciphertext, scorer=scorer, cancelled=deadline)
+
+        # Not ResultCache.crack(...), the response tells if the key was cached.
+        cipher, result = self.cache.get(text) if self.cache is not None else (None, None)
+        cached = result is not None
+        if not cached:
+            cipher, result = solve(text)
+            if result is not None and cipher is not None and self.cache is not None:
+                self.cache.put(text, cipher, result)
+        if result is None:
+            return {"status": "timeout" if deadline.is_set() else "no-key"}
+
+        response = {
+            "status": "ok",
+            "cipher": cipher,
+            "key": result.key,
+            "plaintext": result.plaintext,
+            "score": float(result.score),
+            "cached": cached,
+        }
+        if grammar:
+            # Chunks corrected for earlier requests come from the cache.
+            start = time.perf_counter()
+            response["plaintext"] = self.corrector.correct(result.plaintext)
+            response["grammar_seconds"] = time.perf_counter() - start
+        return response
+
+    def decode(self, text: str) -> Dict[str, Any]:
+        model = self.model
+        if model is None:
+            return {"status": "no-model"}
+        return {"status": "ok", "plaintext": " ".join(model.run(text.split()))}
+
+
+class DecipherRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answers the JSON requests of one connection."""
+
+    # Seconds to wait for a slow client before dropping the connection.
+    timeout = 30
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address.
+        return self.client_address[0] if self.client_address else "unix"
+
+    def send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            cache: Optional[ResultCache] = self.server.service.cache  # type: ignore
+            self.send_json(200, {
+                "status": "ok",
+                "cache": None if cache is None else {"hits": cache.hits, "misses": cache.misses},
+            })
+        else:
+            self.send_json(404, {"status": "error", "error": f"no such endpoint {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path not in ("/crack", "/decode"):
+            self.send_json(404, {"status": "error", "error": f"no such endpoint {self.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > max_body_size:
+            self.send_json(413, {"status": "error", "error": "request too large"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length))
+            text = request["text"]
+            if not isinstance(text, str):
+                raise TypeError("text must be a string")
+            timeout = request.get("timeout")
+            if timeout is not None and (
+                isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not timeout > 0
+            ):
+                raise ValueError("timeout must be a positive number of seconds")
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_json(400, {"status": "error", "error": f"bad request: {error}"})
+            return
+
+        slots: threading.BoundedSemaphore = self.server.slots  # type: ignore
+        if not slots.acquire(timeout=queue_timeout):
+            self.send_json(503, {"status": "busy"})
+            return
+        try:
+            service: DecipherService = self.server.service  # type: ignore
+            if self.path == "/crack":
+                response = service.crack(
+                    text,
+                    auto=bool(request.get("auto")),
+                    quadgrams=bool(request.get("quadgrams")),
+                    grammar=bool(request.get("grammar")),
+                    timeout=timeout,
+                )
+            else:
+                response = service.decode(text)
+        except Exception as error:
+            # One bad request must not take the daemon down with it.
+            self.log_error("%s failed: %r", self.path, error)
+            self.send_json(500, {"status": "error", "error": str(error)})
+            return
+        finally:
+            slots.release()
+        self.send_json(200, response)
+
+
+class DecipherHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+if hasattr(socket, "AF_UNIX"):
+
+    class DecipherUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def serve(
+    address: str = default_address,
+    requests: int = max_requests,
+    timeout: float = max_timeout,
+    cache: bool = True,
+    verbose: bool = False,
+) -> None:
+    """Run the daemon until it is interrupted.
+
+    Args:
+        address (str, optional): `host:port` or a Unix socket path.
+            Defaults to `default_address`.
+        requests (int, optional): Requests worked on at the same time.
+            Defaults to `max_requests`.
+        timeout (float, optional): Longest crack in seconds. Defaults to `max_timeout`.
+        cache (bool, optional): Keep cracked keys in a `ResultCache`. Defaults to True.
+        verbose (bool, optional): Log every request. Defaults to False.
+    """
+    parsed: Final = parse_address(address)
+    if isinstance(parsed, str):
+        if os.path.dirname(parsed):
+            os.makedirs(os.path.dirname(parsed), exist_ok=True)
+        if os.path.exists(parsed) and not DecipherClient(address).running():
+            os.remove(parsed)  # left behind by a daemon that died
+        server: socketserver.BaseServer = DecipherUnixServer(parsed, DecipherRequestHandler)
+    else:
+        server = DecipherHTTPServer(parsed, DecipherRequestHandler)
+
+    if not verbose:
+        DecipherRequestHandler.log_message = lambda *args: None  # type: ignore
+
+    server.service = DecipherService(timeout, cache)  # type: ignore
+    server.slots = threading.BoundedSemaphore(requests)  # type: ignore
+    server.service.warm()  # type: ignore
+    print(f"Serving on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(parsed, str) and os.path.exists(parsed):
+            os.remove(parsed)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP over a Unix socket."""
+
+    def __init__(self, path: str, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class DecipherClient(object):
+    """Talks to a running daemon.
+
+    Args:
+        address (str, optional): `host:port` or a Unix socket path.
+            Defaults to `default_address`.
+    """
+
+    def __init__(self, address: str = default_address) -> None:
+        super().__init__()
+        self.address = parse_address(address)
+
+    def request(
+        self, method: str, path: str, body: Optional[Dict] = None, timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        if isinstance(self.address, str):
+            connection: http.client.HTTPConnection = UnixHTTPConnection(self.address, timeout)
+        else:
+            connection = http.client.HTTPConnection(*self.address, timeout=timeout)
+        try:
+            data = None if body is None else json.dumps(body).encode("utf-8")
+            connection.request(method, path, data, {"Content-Type": "application/json"})
+            return json.loads(connection.getresponse().read())
+        finally:
+            connection.close()
+
+    def running(self) -> bool:
+        """Whether a daemon answers on the address."""
+        if isinstance(self.address, str) and not os.path.exists(self.address):
+            return False
+        try:
+            return self.request("GET", "/health", timeout=0.5).get("status") == "ok"
+        except client_errors:
+            return False
+
+    def crack(
+        self,
+        text: str,
+        auto: bool = False,
+        quadgrams: bool = False,
+        grammar: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Crack a text on the daemon.
+
+        Args:
+            text (str): The ciphertext.
+            auto (bool, optional): Tell a Caesar cipher apart first. Defaults to False.
+            quadgrams (bool, optional): Score by quadgram fitness. Defaults to False.
+            grammar (bool, optional): Correct the grammar of the plaintext.
+                Defaults to False.
+            timeout (Optional[float], optional): Seconds the crack may take,
+                the daemon's own limit if None.
+
+        Raises:
+            OSError: The daemon did not answer within `timeout` (`max_timeout`
+                if None) and `response_slack` seconds, see `client_errors`.
+
+        Returns:
+            Dict[str, Any]: The JSON response, its status is "busy" when the
+                daemon turned the request away.
+        """
+        body = {
+            "text": text,
+            "auto": auto,
+            "quadgrams": quadgrams,
+            "grammar": grammar,
+            "timeout": timeout,
+        }
+        # Allow for the time spent waiting for a slot and correcting grammar.
+        return self.request(
+            "POST", "/crack", body, timeout=(timeout or max_timeout) + response_slack
+        )
+
+    def decode(self, text: str) -> Dict[str, Any]:
+        return self.request("POST", "/decode", {"text": text})
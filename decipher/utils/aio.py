@@ -0,0 +1,143 @@
+"""
+Cracking from asyncio code, without blocking the event loop.
+
+The key search runs in an executor thread and is handed a
+`threading.Event` as its `cancelled` event. `hack_key(...)` checks it
+between key lengths and between batches of candidate keys, so when the
+awaiting task is cancelled or its `timeout` runs out, the search also stops
+within a batch instead of running on in the background. The blocking
+`vig.hack(...)` and `vig.hack_key(...)` are unchanged.
+
+Example: -
+
+```python
+import asyncio
+from decipher.utils import aio
+
+async def main():
+    result = await aio.crack(ciphertext, timeout=5)  # HackResult or None
+    results = await aio.crack_many(ciphertexts, concurrency=4, timeout=5,
+                                   return_exceptions=True)
+
+asyncio.run(main())
+```
+"""
+
+import asyncio
+import threading
+import functools
+import concurrent.futures
+
+from typing import Any, Iterable, List, Optional
+
+from decipher.utils.vig import HackResult, hack_key
+from decipher.utils import caesar
+
+
+# Ciphertexts cracked at the same time by `crack_many(...)`.
+concurrency: int = 4
+
+
+def crack_sync(
+    ciphertext: Any, auto: bool = False, cancelled: Any = None, **options: Any
+) -> Optional[HackResult]:
+    """The blocking search run by `crack(...)`.
+
+    Args:
+        ciphertext (Any): The text, or a `CipherText`.
+        auto (bool, optional): Route between Caesar and Vigenère with
+            `caesar.crack(...)`. Defaults to False, Vigenère only.
+        cancelled (Any, optional): Event that stops the search once set.
+        **options: Passed on to `hack_key(...)`, like `scorer` or `workers`.
+
+    Returns:
+        Optional[HackResult]: The result, None if no key was found.
+    """
+    if auto:
+        return caesar.crack(ciphertext, cancelled=cancelled, **options)[1]
+    return hack_key(ciphertext, cancelled=cancelled, **options)
+
+
+async def crack(
+    ciphertext: Any,
+    timeout: Optional[float] = None,
+    auto: bool = False,
+    executor: Optional[concurrent.futures.Executor] = None,
+    **options: Any,
+) -> Optional[HackResult]:
+    """Crack a ciphertext in an executor thread.
+
+    Args:
+        ciphertext (Any): The text, or a `CipherText`.
+        timeout (Optional[float], optional): Seconds before giving up, no
+            limit if None.
+        auto (bool, optional): Route between Caesar and Vigenère. Defaults
+            to False.
+        executor (Optional[concurrent.futures.Executor], optional): A thread
+            pool to run in. Defaults to the loop's default executor.
+        **options: Passed on to `hack_key(...)`, like `scorer` or `workers`.
+
+    Raises:
+        asyncio.TimeoutError: The timeout ran out, the search is stopped.
+
+    Returns:
+        Optional[HackResult]: The result, None if no key was found.
+    """
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+    search = loop.run_in_executor(
+        executor, functools.partial(crack_sync, ciphertext, auto, cancelled, **options)
+    )
+    try:
+        return await asyncio.wait_for(search, timeout)
+    finally:
+        # Stops the search thread on a timeout or a cancelled task, a no-op
+        # once it is done.
+        cancelled.set()
+
+
+async def crack_many(
+    ciphertexts: Iterable[Any],
+    concurrency: int = concurrency,
+    timeout: Optional[float] = None,
+    return_exceptions: bool = False,
+    **options: Any,
+) -> List[Any]:
+    """Crack many ciphertexts, at most `concurrency` at the same time.
+
+    Args:
+        ciphertexts (Iterable[Any]): The texts, or `CipherText`s.
+        concurrency (int, optional): Searches running at once. Defaults to
+            `concurrency`.
+        timeout (Optional[float], optional): Seconds allowed per ciphertext,
+            not counting the wait for a free slot.
+        return_exceptions (bool, optional): Put the exception of a failed or
+            timed out ciphertext in its place of the results, as
+            `asyncio.gather(...)` does. Otherwise the first one is raised
+            and the other searches are stopped. Defaults to False.
+        **options: Passed on to `crack(...)`, like `auto` or `scorer`.
+
+    Returns:
+        List[Any]: A `HackResult` or None per ciphertext, in their order.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    # A pool of its own, so that the searches never wait on other work
+    # queued on the loop's default executor.
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="decipher"
+    )
+
+    async def crack_one(ciphertext: Any) -> Optional[HackResult]:
+        async with slots:
+            return await crack(ciphertext, timeout, executor=executor, **options)
+
+    tasks = [asyncio.ensure_future(crack_one(ciphertext)) for ciphertext in ciphertexts]
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Lets the cancelled tasks tell their searches to stop, the threads
+        # then finish on their own without blocking the loop.
+        await asyncio.gather(*tasks, return_exceptions=True)
+        executor.shutdown(wait=False)
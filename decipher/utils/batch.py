@@ -0,0 +1,204 @@
+"""
+Cracks many files in one warm process.
+
+Files are given as directories, glob patterns or manifests (`@list.txt`, a
+file with one path per line). They are fanned out to a pool of worker
+processes that load the word list once. Every file gets one JSON line with
+its recovered key as soon as it is done, in the order the files finish.
+
+Example: -
+
+```python
+import sys
+import decipher.utils.batch as batch
+
+batch.crack_files(["captures/", "extra/*.txt", "@nightly.txt"], sys.stdout, timeout=30)
+```
+
+```json
+{"path": "captures/a.txt", "status": "ok", "cipher": "vigenere", "key": "LEMON", "score": -812.4, "elapsed": 0.031}
+{"path": "captures/b.txt", "status": "timeout", "cipher": null, "key": null, "score": null, "elapsed": 30.0}
+```
+
+The `status` is one of `ok`, `no-key`, `timeout` or `error` (then with an
+`error` message as well). With a result cache every line also tells if the
+key came from the `cached` results.
+"""
+
+import os
+import glob
+import json
+import time
+import concurrent.futures
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from decipher.utils.vig import ENGLISH_WORDS
+from decipher.utils.cache import ResultCache
+from decipher.utils.caesar import crack
+from decipher.utils.stream import sample_size
+
+
+# Prefix of a path naming a manifest file instead of a ciphertext.
+manifest_prefix: str = "@"
+
+
+class Deadline(object):
+    """Set once `seconds` have passed, used as the `cancelled` event of a
+    search so that it gives up when its time is up.
+
+    Args:
+        seconds (Optional[float]): Time allowed, never set if None.
+    """
+
+    def __init__(self, seconds: Optional[float]) -> None:
+        super().__init__()
+        self.end = None if seconds is None else time.monotonic() + seconds
+
+    def is_set(self) -> bool:
+        return self.end is not None and time.monotonic() >= self.end
+
+
+def expand_paths(sources: Iterable[str]) -> List[str]:
+    """Turn directories, glob patterns and manifests into a list of files.
+
+    Args:
+        sources (Iterable[str]): Files, directories (searched recursively),
+            glob patterns or `@manifest` files with one path per line.
+
+    Returns:
+        List[str]: Every file once, in the order it was first named.
+    """
+    paths: Dict[str, None] = {}
+    for source in sources:
+        if source.startswith(manifest_prefix):
+            with open(source[len(manifest_prefix):]) as manifest:
+                names = [line.strip() for line in manifest]
+            paths.update(dict.fromkeys(expand_paths(name for name in names if name)))
+        elif os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                paths.update(dict.fromkeys(os.path.join(root, file) for file in sorted(files)))
+        elif glob.has_magic(source):
+            paths.update(
+                dict.fromkeys(path for path in sorted(glob.glob(source, recursive=True))
+                              if os.path.isfile(path))
+            )
+        else:
+            paths[source] = None
+    return list(paths)
+
+
+def crack_one(
+    path: str,
+    timeout: Optional[float] = None,
+    sample_size: int = sample_size,
+    cache: Optional[str] = None,
+    refresh: bool = False,
+    **options: Any,
+) -> Dict[str, Any]:
+    """Recover the key of one file from its first `sample_size` characters.
+
+    Args:
+        path (str): The encrypted file.
+        timeout (Optional[float], optional): Seconds before giving up.
+        sample_size (int, optional): Characters to recover the key from.
+        cache (Optional[str], optional): Path of the `ResultCache` database
+            to look keys up in and store them to, not cached if None.
+        refresh (bool, optional): Crack even if the key is cached, and
+            replace it. Defaults to False.
+        **options: Passed on to `caesar.crack(...)`, like `scorer`.
+
+    Returns:
+        Dict[str, Any]: The JSON record of the file, with the cipher it was
+            encrypted with as told by `caesar.crack(...)`.
+    """
+    start = time.monotonic()
+    deadline = Deadline(timeout)
+    record: Dict[str, Any] = {
+        "path": path, "status": "no-key", "cipher": None, "key": None, "score": None,
+    }
+    try:
+        results = ResultCache(cache) if cache is not None else None
+        with open(path, newline="") as file:
+            text = file.read(sample_size)
+        if results is not None:
+            cipher, result = results.crack(
+                text,
+                lambda ciphertext: crack(ciphertext, cancelled=deadline, **options),
+                refresh=refresh,
+            )
+            record["cached"] = results.hits > 0
+        else:
+            cipher, result = crack(text, cancelled=deadline, **options)
+    except Exception as error:
+        # One bad file, or a bug it triggers, must not end the whole batch.
+        record.update(status="error", error=f"{type(error).__name__}: {error}")
+    else:
+        if result is not None:
+            record.update(
+                status="ok", cipher=cipher, key=result.key, score=round(float(result.score), 3)
+            )
+        elif deadline.is_set():
+            record["status"] = "timeout"
+    record["elapsed"] = round(time.monotonic() - start, 3)
+    return record
+
+
+def _init_batch_worker(word_list_path: str) -> None:
+    ENGLISH_WORDS.use(word_list_path)
+    # Load the word list now, once per worker instead of within a timed file.
+    ENGLISH_WORDS.words
+
+
+def crack_many(
+    paths: Iterable[str], workers: int = 1, timeout: Optional[float] = None, **options: Any
+) -> Iterator[Dict[str, Any]]:
+    """Crack every file in a pool of worker processes.
+
+    Args:
+        paths (Iterable[str]): The encrypted files.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        timeout (Optional[float], optional): Seconds allowed per file.
+        **options: Passed on to `crack_one(...)`.
+
+    Yields:
+        Iterator[Dict[str, Any]]: The record of every file as it finishes.
+    """
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_batch_worker, initargs=(ENGLISH_WORDS.path,),
+    ) as executor:
+        futures = [executor.submit(crack_one, path, timeout, **options) for path in paths]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def crack_files(
+    sources: Iterable[str],
+    destination: TextIO,
+    workers: int = 1,
+    timeout: Optional[float] = None,
+    **options: Any,
+) -> int:
+    """Crack the files of `sources` and write one JSON line per file.
+
+    Args:
+        sources (Iterable[str]): Files, directories, glob patterns or manifests.
+        destination (TextIO): Where the JSON lines are written to.
+        workers (int, optional): Number of worker processes. Defaults to 1.
+        timeout (Optional[float], optional): Seconds allowed per file.
+        **options: Passed on to `crack_one(...)`.
+
+    Returns:
+        int: Number of files a key was found for.
+    """
+    cracked = 0
+    for record in crack_many(expand_paths(sources), workers, timeout, **options):
+        destination.write(json.dumps(record, ensure_ascii=False) + "\n")
+        destination.flush()
+        cracked += record["status"] == "ok"
+    return cracked
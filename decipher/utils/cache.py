@@ -0,0 +1,210 @@
+"""
+On-disk cache of cracked keys, keyed by the fingerprint of a ciphertext.
+
+The fingerprint is the SHA-256 of the letters of the ciphertext only, so
+the same message with other spacing, punctuation or case is found again.
+The cache keeps the key, the key length, the cipher and the score, never
+the plaintext: on a hit the plaintext is rebuilt with a single decryption.
+Entries not used for `max_age` seconds are dropped, and only the
+`max_entries` most recently used ones are kept.
+
+Example: -
+
+```python
+from decipher.utils.cache import ResultCache
+from decipher.utils.caesar import crack
+
+cache = ResultCache()  # ~/.cache/decipher/cache.sqlite3
+cipher, result = cache.crack(ciphertext, crack)  # cracked and stored
+cipher, result = cache.crack(ciphertext, crack)  # one decryption
+print(cache.hits, cache.misses)  # 1 1
+cipher, result = cache.crack(ciphertext, crack, refresh=True)  # cracked again and replaced
+```
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import contextlib
+
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from decipher.utils.vig import CipherText, HackResult, as_cipher_text
+
+
+def cache_directory() -> str:
+    """Where the cache lives, the same from any working directory: in
+    `$XDG_CACHE_HOME/decipher/` if set, in `~/.cache/decipher/` otherwise.
+
+    Returns:
+        str: The absolute path of the directory.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.abspath(os.path.join(cache_home, "decipher"))
+
+
+# The database of cracked keys. DECIPHER_CACHE overrides it.
+default_cache_path: str = os.environ.get(
+    "DECIPHER_CACHE", os.path.join(cache_directory(), "cache.sqlite3")
+)
+# Entries kept, the least recently used ones are dropped first.
+max_entries: int = 100_000
+# Seconds an entry is kept after it was last used.
+max_age: float = 30 * 24 * 60 * 60
+
+CrackResult = Tuple[Optional[str], Optional[HackResult]]
+
+
+def fingerprint(ciphertext: Any) -> str:
+    """Hash the letters of a ciphertext, ignoring everything else but the
+    position in the key it starts at.
+
+    Args:
+        ciphertext (Any): The text, or a `CipherText`.
+
+    Returns:
+        str: The SHA-256 of the letter stream, as hex.
+    """
+    cipher = as_cipher_text(ciphertext)
+    digest = hashlib.sha256(cipher.letters.tobytes())
+    if cipher.offset:
+        # A text starting mid-key needs a key rotated by the offset.
+        digest.update(b"@%d" % cipher.offset)
+    return digest.hexdigest()
+
+
+class ResultCache(object):
+    """Cracked keys in an SQLite database. Every call opens its own
+    connection and the hit and miss counters are locked, so one cache can
+    be shared by threads and processes.
+
+    Args:
+        path (str, optional): The database file. Defaults to `default_cache_path`.
+        max_entries (int, optional): Entries kept. Defaults to `max_entries`.
+        max_age (float, optional): Seconds an unused entry is kept.
+            Defaults to `max_age`.
+    """
+
+    def __init__(
+        self,
+        path: str = default_cache_path,
+        max_entries: int = max_entries,
+        max_age: float = max_age,
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.__counter_lock = threading.Lock()
+        self.__ready = False
+
+    @contextlib.contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        if not self.__ready and os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with contextlib.closing(sqlite3.connect(self.path, timeout=10)) as db:
+            with db:  # commits, or rolls back on error
+                if not self.__ready:
+                    db.execute(
+                        "CREATE TABLE IF NOT EXISTS results ("
+                        " fingerprint TEXT PRIMARY KEY, key TEXT NOT NULL,"
+                        " key_length INTEGER NOT NULL, cipher TEXT NOT NULL,"
+                        " score REAL, created REAL NOT NULL, used REAL NOT NULL)"
+                    )
+                    db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+                    self.__ready = True
+                yield db
+
+    def get(self, ciphertext: Any) -> CrackResult:
+        """Look a ciphertext up and decrypt it with the cached key.
+
+        Args:
+            ciphertext (Any): The text, or a `CipherText`.
+
+        Returns:
+            CrackResult: The cipher and the result, (None, None) on a miss.
+        """
+        cipher = as_cipher_text(ciphertext)
+        digest = fingerprint(cipher)
+        with self.connect() as db:
+            row = db.execute(
+                "SELECT key, cipher, score FROM results WHERE fingerprint = ? AND used >= ?",
+                (digest, time.time() - self.max_age),
+            ).fetchone()
+            if row is None:
+                with self.__counter_lock:
+                    self.misses += 1
+                return None, None
+            db.execute("UPDATE results SET used = ? WHERE fingerprint = ?", (time.time(), digest))
+        with self.__counter_lock:
+            self.hits += 1
+        key, name, score = row
+        return name, HackResult(key, cipher.decrypt_text(key), score)
+
+    def put(self, ciphertext: Any, name: str, result: HackResult) -> None:
+        """Store the key of a ciphertext, and drop old entries.
+
+        Args:
+            ciphertext (Any): The text, or a `CipherText`.
+            name (str): The cipher, like "vigenere".
+            result (HackResult): The cracked result.
+        """
+        now = time.time()
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint(ciphertext), result.key, len(result.key), name,
+                 float(result.score), now, now),
+            )
+            db.execute("DELETE FROM results WHERE used < ?", (now - self.max_age,))
+            (entries,) = db.execute("SELECT COUNT(*) FROM results").fetchone()
+            if entries > self.max_entries:
+                # Everything used before the max_entries-th most recent entry,
+                # found by walking the index of the use times.
+                db.execute(
+                    "DELETE FROM results WHERE used <="
+                    " (SELECT used FROM results ORDER BY used DESC LIMIT 1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def delete(self, ciphertext: Any) -> None:
+        """Forget the key of a ciphertext.
+
+        Args:
+            ciphertext (Any): The text, or a `CipherText`.
+        """
+        with self.connect() as db:
+            db.execute("DELETE FROM results WHERE fingerprint = ?", (fingerprint(ciphertext),))
+
+    def crack(
+        self, ciphertext: Any, solve: Callable[[CipherText], CrackResult], refresh: bool = False
+    ) -> CrackResult:
+        """Answer from the cache, or crack with `solve` and remember the key.
+
+        Args:
+            ciphertext (Any): The text, or a `CipherText`.
+            solve (Callable[[CipherText], CrackResult]): Cracks a ciphertext,
+                like `caesar.crack`. Failures are not cached.
+            refresh (bool, optional): Skip the lookup and replace the cached
+                key with the new result, or drop it if no key is found.
+                Defaults to False.
+
+        Returns:
+            CrackResult: The cipher and the result, (None, None) if no key
+                was found.
+        """
+        cipher = as_cipher_text(ciphertext)
+        if not refresh:
+            name, result = self.get(cipher)
+            if result is not None:
+                return name, result
+        name, result = solve(cipher)
+        if result is not None and name is not None:
+            self.put(cipher, name, result)
+        elif refresh:
+            self.delete(cipher)
+        return name, result
@@ -0,0 +1,89 @@
+"""
+Native Caesar solver, with a Vigenère fallback.
+
+A Caesar cipher is a Vigenère cipher with a one-letter key, so all 26
+shifts are scored at once from one rolled letter histogram (see
+`vig.score_column_shifts(...)`), without any Kasiski examination.
+`crack(...)` first tries the best shift, keeps it if it reads as English
+and falls back to the Vigenère `hack_key(...)` otherwise.
+
+Example: -
+
+```python
+from decipher.utils.caesar import crack, crack_shift
+
+crack_shift("Wkh txlfn eurzq ira").plaintext  # "The quick brown fox"
+
+cipher, result = crack(ciphertext)  # any of the two
+if result is not None:
+    print(cipher, result.key, result.plaintext)
+```
+"""
+
+import numpy
+
+from typing import Any, Optional, Tuple
+
+import decipher.utils.profiling as profiling
+
+from decipher.utils.vig import (
+    COLUMN_SCORING,
+    HackResult,
+    as_cipher_text,
+    hack_key,
+    is_english,
+    score_column_shifts,
+)
+
+
+def crack_shift(ciphertext: Any, method: str = COLUMN_SCORING) -> HackResult:
+    """Find the most English-like of the 26 Caesar shifts.
+
+    Args:
+        ciphertext (Any): The text, or a `CipherText`.
+        method (str, optional): Column scoring, see `vig.score_column_shifts(...)`.
+            Defaults to `COLUMN_SCORING`.
+
+    Returns:
+        HackResult: The one-letter key (A is no shift), the plaintext and
+            its score. This is always the best shift, English or not.
+    """
+    cipher = as_cipher_text(ciphertext)
+    with profiling.active.stage("caesar shifts"):
+        scores = score_column_shifts(cipher.letters, method)
+        shift = int(numpy.argmax(scores))
+        key = chr(ord("A") + shift)
+        plaintext = cipher.decrypt_text(key)
+    profiling.active.count("full decryptions")
+    return HackResult(key, plaintext, float(scores[shift]))
+
+
+def crack(
+    ciphertext: Any, scorer: Any = None, **options: Any
+) -> Tuple[Optional[str], Optional[HackResult]]:
+    """Crack a Caesar or Vigenère ciphertext.
+
+    Args:
+        ciphertext (Any): The text, or a `CipherText`.
+        scorer (Any, optional): Fitness scorer used instead of `is_english(...)`.
+        **options: Passed on to `hack_key(...)`, like `workers` or `cancelled`.
+
+    Returns:
+        Tuple[Optional[str], Optional[HackResult]]: The cipher ("caesar" or
+            "vigenere") and the result, (None, None) if no key was found.
+    """
+    cipher = as_cipher_text(ciphertext)
+    # The shift costs microseconds, so it is always tried first and kept if
+    # it reads as English.
+    result = crack_shift(cipher)
+    with profiling.active.stage("english test"):
+        english = is_english(result.plaintext, scorer=scorer)
+    if english:
+        profiling.active.count("characters", len(cipher.message))
+        return "caesar", result
+
+    result = hack_key(cipher, scorer=scorer, **options)
+    if result is None:
+        return None, None
+    # A Vigenère key of one repeated letter is a Caesar shift.
+    return ("caesar" if len(set(result.key)) == 1 else "vigenere"), result
@@ -2,14 +2,16 @@ import numpy
 import pandas
 import sklearn
 
+import decipher.utils.storage as storage
+
 from typing import Tuple, Any
-from vectorizer import DecipherCustomLightWeightVectorizer
-from snips import deprecated, Singleton
+from decipher.utils.vectorizer import DecipherCustomLightWeightVectorizer
+from decipher.utils.snips import deprecated, Singleton
 
 class DecipherDataFrame(object):
     def __init__(self, path: str) -> None:
         super().__init__()
-        self.dataframe = pandas.read_csv(path)
+        self.dataframe = storage.read(path)
         self.dataframe.columns = ["source", "key", "converted"]
 
         # Checking for null value and removing rows with null value
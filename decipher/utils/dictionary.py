@@ -0,0 +1,117 @@
+"""
+Lazily loaded English word list used by decipher to recognise plaintext.
+
+Example: -
+
+```python
+from decipher.utils.dictionary import WordList
+
+words = WordList()  # nothing is read yet
+"HELLO" in words  # the word list is loaded here, on first use
+
+words.use("english-words/words_alpha.txt")  # switch to another word list
+```
+
+The default word list is `words.pickle`, shipped inside the package next
+to this module, so it does not matter which directory decipher is run
+from. It holds the words of `dictionary.txt`, uppercased and sorted, and
+loads without parsing any text. The `DECIPHER_WORD_LIST` environment
+variable overrides it. To rebuild it from a word list file, run: -
+
+```bash
+python -m decipher.utils.dictionary dictionary.txt
+```
+"""
+
+import os
+import sys
+import pickle
+
+from typing import FrozenSet, Optional
+
+
+default_word_list: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "words.pickle"
+)
+word_list_variable: str = "DECIPHER_WORD_LIST"
+
+
+def load(path: str) -> FrozenSet[str]:
+    """Read a word list file with one word per line, or a word list saved
+    by `build(...)`.
+
+    Args:
+        path (str): Path of the word list file.
+
+    Returns:
+        FrozenSet[str]: The uppercased words of the file.
+    """
+    if path.endswith(".pickle"):
+        with open(path, "rb") as file:
+            return frozenset(pickle.load(file))
+    with open(path) as file:
+        return frozenset(file.read().upper().split())
+
+
+def build(source: str, path: str = default_word_list) -> FrozenSet[str]:
+    """Save the words of a word list file in the compact form `load(...)`
+    reads back fastest.
+
+    Args:
+        source (str): Word list file with one word per line.
+        path (str, optional): Where to save the words. Defaults to `default_word_list`.
+
+    Returns:
+        FrozenSet[str]: The uppercased words of the file.
+    """
+    words = load(source)
+    with open(path, "wb") as file:
+        # Sorted, so the file is the same on every run.
+        pickle.dump(tuple(sorted(words)), file, protocol=pickle.HIGHEST_PROTOCOL)
+    return words
+
+
+class WordList(object):
+    """A word list that is only read from disk the first time it is used.
+
+    Args:
+        path (Optional[str]): Path of the word list file. Defaults to
+            `DECIPHER_WORD_LIST` or the `words.pickle` shipped with decipher.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        super().__init__()
+        self.path: str = path or os.environ.get(word_list_variable, default_word_list)
+        self.__words: Optional[FrozenSet[str]] = None
+
+    def use(self, path: str) -> None:
+        """Switch to another word list file, it is loaded on next use.
+
+        Args:
+            path (str): Path of the word list file.
+        """
+        self.path = path
+        self.__words = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.__words is not None
+
+    @property
+    def words(self) -> FrozenSet[str]:
+        """The set of words, loaded on first access. Prefer looking up words
+        in this set directly in hot loops."""
+        if self.__words is None:
+            self.__words = load(self.path)
+        return self.__words
+
+    def __contains__(self, word: object) -> bool:
+        return word in self.words
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else "dictionary.txt")
+    print(f"Saved {default_word_list}")
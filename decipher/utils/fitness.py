@@ -0,0 +1,236 @@
+"""
+Quadgram fitness scoring of candidate plaintexts.
+
+A text is scored by the mean log10 probability of its four-letter sequences
+(quadgrams) in English. Unlike dictionary word matching it does not need the
+spaces of the plaintext to survive encryption. The probabilities are kept in
+a precomputed 26⁴ table `quadgrams.npy`, which is memory-mapped on first use.
+The shipped table was counted from the module, class and function docstrings
+of the Python 3.11 standard library (test packages left out), as collected by
+`stdlib_docstrings(...)`, with `unseen_count` for the quadgrams they lack.
+
+Example: -
+
+```python
+from decipher.utils.fitness import QuadgramScorer
+from decipher.utils.vig import hack
+
+scorer = QuadgramScorer()
+scorer.score("Attack at dawn, hold the northern bridge.")  # about -5.1
+scorer.score("Xqjv kplm zzrw qqwe rtyu iopa")  # about -7.7
+scorer.is_english("Attack at dawn, hold the northern bridge.")  # True
+
+hack(ciphertext, scorer=scorer)  # use it instead of the dictionary
+```
+
+To rebuild the shipped table from the standard library of the running Python,
+or a table from other English text files, run: -
+
+```bash
+python -m decipher.utils.fitness --stdlib
+python -m decipher.utils.fitness corpus.txt [corpus.txt ...]
+```
+"""
+
+import os
+import ast
+import sys
+import numpy
+import sysconfig
+
+from typing import Iterable, Iterator, Optional, Sequence, Union
+
+from decipher.utils.vig import CipherText
+
+
+quadgram_path: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "quadgrams.npy"
+)
+# Mean log10 probability per quadgram a text needs to pass as English.
+quadgram_threshold: float = -5.5
+# Count given to quadgrams that never occur in the corpus.
+unseen_count: float = 0.01
+
+
+def quadgram_codes(letters: numpy.ndarray) -> numpy.ndarray:
+    """Pack every four consecutive letter indexes into one table index.
+
+    Args:
+        letters (numpy.ndarray): Letter indexes (0-25), one row per text.
+
+    Returns:
+        numpy.ndarray: Quadgram table indexes, one row per text.
+    """
+    letters = numpy.asarray(letters, dtype=numpy.int64)
+    return (
+        (letters[..., :-3] * 26 + letters[..., 1:-2]) * 26 + letters[..., 2:-1]
+    ) * 26 + letters[..., 3:]
+
+
+def stdlib_docstrings(root: Optional[str] = None) -> Iterator[str]:
+    """The docstrings of the modules, classes and functions of the Python
+    standard library, the corpus of the shipped quadgram table. Test
+    packages and `site-packages` are left out.
+
+    Args:
+        root (Optional[str], optional): The standard library directory.
+            Defaults to that of the running Python.
+
+    Yields:
+        Iterator[str]: The docstrings, file by file in sorted order.
+    """
+    root = root or sysconfig.get_paths()["stdlib"]
+    for directory, directories, files in os.walk(root):
+        directories[:] = sorted(
+            name for name in directories
+            if name not in ("site-packages", "test") and "tests" not in name
+        )
+        for name in sorted(files):
+            if not name.endswith(".py"):
+                continue
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8") as file:
+                    tree = ast.parse(file.read())
+            except (SyntaxError, UnicodeDecodeError, ValueError):
+                continue
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                    docstring = ast.get_docstring(node)
+                    if docstring:
+                        yield docstring
+
+
+def build_texts(texts: Iterable[str], path: str = quadgram_path) -> numpy.ndarray:
+    """Count the quadgrams of English texts and save their log10
+    probabilities as the quadgram table.
+
+    Args:
+        texts (Iterable[str]): The texts, only their letters are counted.
+        path (str, optional): Where to save the table. Defaults to `quadgram_path`.
+
+    Returns:
+        numpy.ndarray: The table of 26⁴ log10 probabilities.
+    """
+    # Quadgrams never span two texts, they are counted in one pass.
+    codes = [quadgram_codes(CipherText(text).letters) for text in texts]
+    counts = numpy.bincount(
+        numpy.concatenate(codes or [numpy.zeros(0, dtype=numpy.int64)]), minlength=26 ** 4
+    ).astype(numpy.float64)
+
+    counts[counts == 0] = unseen_count
+    table = numpy.log10(counts / counts.sum()).astype(numpy.float32)
+    numpy.save(path, table)
+    return table
+
+
+def build(corpus_paths: Iterable[str], path: str = quadgram_path) -> numpy.ndarray:
+    """Count the quadgrams of English text files and save their log10
+    probabilities as the quadgram table.
+
+    Args:
+        corpus_paths (Iterable[str]): Text files to count quadgrams from.
+        path (str, optional): Where to save the table. Defaults to `quadgram_path`.
+
+    Returns:
+        numpy.ndarray: The table of 26⁴ log10 probabilities.
+    """
+    def read(corpus_path: str) -> str:
+        with open(corpus_path, encoding="utf-8", errors="ignore") as file:
+            return file.read()
+
+    return build_texts((read(corpus_path) for corpus_path in corpus_paths), path)
+
+
+def build_stdlib(path: str = quadgram_path) -> numpy.ndarray:
+    """Rebuild the shipped quadgram table from `stdlib_docstrings(...)`.
+
+    Args:
+        path (str, optional): Where to save the table. Defaults to `quadgram_path`.
+
+    Returns:
+        numpy.ndarray: The table of 26⁴ log10 probabilities.
+    """
+    return build_texts(stdlib_docstrings(), path)
+
+
+class QuadgramScorer(object):
+    """Scores texts by the mean log10 probability of their quadgrams.
+
+    Args:
+        path (str, optional): Quadgram table file. Defaults to `quadgram_path`.
+        threshold (float, optional): Score a text needs to pass as English.
+            Defaults to `quadgram_threshold`.
+    """
+
+    def __init__(
+        self, path: str = quadgram_path, threshold: float = quadgram_threshold
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.threshold = threshold
+        self.__table: Optional[numpy.ndarray] = None
+
+    @property
+    def table(self) -> numpy.ndarray:
+        """The quadgram table, memory-mapped on first access."""
+        if self.__table is None:
+            self.__table = numpy.load(self.path, mmap_mode="r")
+        return self.__table
+
+    def __getstate__(self) -> dict:
+        # Worker processes map the table themselves instead of receiving a copy.
+        state = self.__dict__.copy()
+        state[f"_{type(self).__name__}__table"] = None
+        return state
+
+    def score_letters(self, letters: numpy.ndarray) -> numpy.ndarray:
+        """Score one or more texts given as letter indexes in a single
+        gather-and-sum over the table.
+
+        Args:
+            letters (numpy.ndarray): Letter indexes (0-25) of a text, or a 2D
+                array with one equally long text per row.
+
+        Returns:
+            numpy.ndarray: The score of every row, -inf for texts shorter
+                than a quadgram.
+        """
+        letters = numpy.atleast_2d(letters)
+        if letters.shape[1] < 4:
+            return numpy.full(letters.shape[0], -numpy.inf)
+        return self.table[quadgram_codes(letters)].mean(axis=1)
+
+    def score(self, texts: Union[str, Sequence[str]]) -> Union[float, numpy.ndarray]:
+        """Score a text, or every text of a list. Only the letters count.
+
+        Args:
+            texts (Union[str, Sequence[str]]): The text or texts to score.
+
+        Returns:
+            Union[float, numpy.ndarray]: The score of the text, or an array
+                with the score of every text.
+        """
+        if isinstance(texts, str):
+            return float(self.score_letters(CipherText(texts).letters)[0])
+
+        letters = [CipherText(text).letters for text in texts]
+        codes = [quadgram_codes(text) for text in letters]
+        lengths = numpy.array([len(text) for text in codes])
+        if not lengths.any():
+            return numpy.full(len(texts), -numpy.inf)
+        # One gather for all texts, then sum the quadgrams of each text.
+        gathered = self.table[numpy.concatenate(codes)]
+        owners = numpy.repeat(numpy.arange(len(texts)), lengths)
+        sums = numpy.bincount(owners, weights=gathered, minlength=len(texts))
+        return numpy.where(lengths > 0, sums / numpy.maximum(lengths, 1), -numpy.inf)
+
+    def is_english(self, text: str) -> bool:
+        return self.score(text) >= self.threshold
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] in ([], ["--stdlib"]):
+        build_stdlib()
+    else:
+        build(sys.argv[1:])
+    print(f"Saved {quadgram_path}")
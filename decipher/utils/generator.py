@@ -4,44 +4,72 @@ Generates cipher encoded dataset for decipher.
 Example: -
 
 ```python
-import itertools
-import multiprocessing as mp
+import nltk
 import decipher.utils.generator as gen
 
-mgr: Final = mp.Manager()
-
-# Setup the dataset path
-gen.make()
-
-keys: Final = gen.split(range(0, 100), splits=gen.threads)
-corpus_words: Final = gen.split(nltk.corpus.words.words(), splits=gen.threads)
-
 if __name__ == "__main__":
-    thread_id: ValueProxy = mgr.Value(ctypes.c_int, 0)
+    # Setup the dataset path
+    gen.make()
 
-    with mp.Pool(gen.threads) as pool:
-        pool.starmap(
-            gen.generate_thread, zip(corpus_words, itertools.repeat(thread_id), keys),
-        )
+    path = gen.generate(nltk.corpus.words.words(), keys=range(0, 100))
 ```
 
-Refer`generate_thread(...)`function for more information
-on the generating process parameter(s).
+The words are cut into batches of `batch_size` words, which a pool of
+worker processes takes one at a time, so a worker that is done early takes
+the next batch instead of waiting. Every batch is written to its own shard
+file, which only appears under its final name once it is complete, and
+the parent process reports the rows per second and the time left.
+`merge(...)` then joins the shards in the order of the batches into
+`data.csv`. The rows follow the order of the words, so the same words and
+keys always give the same file, whatever the number of workers or the
+batch size. Refer `generate_thread(...)` function for more information on
+the generating process parameter(s).
+
+Keys are Caesar shifts, so every key is taken modulo 26 and each distinct
+shift is generated once: keys 0 to 99 give 26 shifts, not 100. All the
+words of a block are encrypted with one `str.translate(...)` call per
+shift and written to the file at once.
+
+The dataset is `data.csv`, or `data.parquet` with `format="parquet"`, see
+`decipher.utils.storage`.
 """
 
 import os
-import numpy
+import time
+import glob
+import shutil
+import string
+import multiprocessing
 
-from caesarcipher import CaesarCipher
+import decipher.utils.storage as storage
 
-from typing import Any, Iterable, List
-from multiprocessing.managers import ValueProxy
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
 
 
 threads: int = os.cpu_count() or 1
 working_path: str = ".decipher/"
 dataset_path: str = "dataset/"
 dataset_filename: str = "data.csv"
+# Folder of the shard files, one per worker, inside the dataset folder.
+shards_path: str = "shards/"
+# Words encrypted and written at a time, for every shift.
+block_size: int = 10_000
+# Words per task of the worker pool, a shard file each.
+batch_size: int = 2_000
+# Seconds between progress lines.
+progress_interval: float = 1.0
+
+
+def dataset_file(format: str = "csv") -> str:
+    """Path of the dataset file in a format.
+
+    Args:
+        format (str, optional): "csv" or "parquet". Defaults to "csv".
+
+    Returns:
+        str: The path.
+    """
+    return storage.with_format(f"{working_path}{dataset_path}/{dataset_filename}", format)
 
 
 def make() -> None:
@@ -53,35 +81,103 @@ def make() -> None:
     if not os.path.exists(f"{working_path}{dataset_path}"):
         os.mkdir(f"{working_path}{dataset_path}")
 
-    if os.path.exists(f"{working_path}{dataset_path}/{dataset_filename}"):
-        os.remove(f"{working_path}{dataset_path}/{dataset_filename}")
+    for format in storage.formats:
+        if os.path.exists(dataset_file(format)):
+            os.remove(dataset_file(format))
+
+    # Shards left over from an interrupted run.
+    shutil.rmtree(f"{working_path}{dataset_path}{shards_path}", ignore_errors=True)
+    os.mkdir(f"{working_path}{dataset_path}{shards_path}")
+
+
+def shift_table(shift: int) -> Dict[int, int]:
+    """Translation table of a Caesar shift, for `str.translate(...)`. The
+    case of the letters is kept and every other character is left as is.
+
+    Args:
+        shift (int): The shift, any integer.
+
+    Returns:
+        Dict[int, int]: The table.
+    """
+    shift %= 26
+    lower, upper = string.ascii_lowercase, string.ascii_uppercase
+    return str.maketrans(
+        lower + upper, lower[shift:] + lower[:shift] + upper[shift:] + upper[:shift]
+    )
+
+
+def unique_shifts(keys: Iterable[int]) -> List[int]:
+    """The distinct shifts of some keys, in the order they first appear.
+
+    Args:
+        keys (Iterable[int]): Keys, any integers.
+
+    Returns:
+        List[int]: Every key modulo 26, once.
+    """
+    return list(dict.fromkeys(int(key) % 26 for key in keys))
+
+
+def encrypt_block(words: List[str], shifts: List[int]) -> Tuple[List[str], List[int], List[str]]:
+    """Encrypt words with every shift.
+
+    Args:
+        words (List[str]): Words without commas or line breaks.
+        shifts (List[int]): Shifts from 0 to 25.
+
+    Returns:
+        Tuple[List[str], List[int], List[str]]: The `source`, `key` and
+            `converted` columns, with the rows of every word in turn and
+            its shifts in order.
+    """
+    text = "\n".join(words)
+    encrypted = [text.translate(shift_table(shift)).split("\n") for shift in shifts]
+    sources = [word for word in words for _ in shifts]
+    ciphers = [cipher for ciphers in zip(*encrypted) for cipher in ciphers]
+    return sources, shifts * len(words), ciphers
+
+
+def temporary(path: str) -> str:
+    """Name a file is written under before it is renamed to `path`. It keeps
+    the extension, which tells its format.
+    """
+    folder, name = os.path.split(path)
+    return os.path.join(folder, f"tmp-{name}")
 
 
-def split(iteratable: Iterable, splits: int = 1) -> Iterable[List[Any]]:
-    """Split any iterable into thread-ready individual iterables.
+def shard_filename(shard: int, format: str = "csv") -> str:
+    """Path of the shard file written by worker `shard`.
 
     Args:
-        iteratable (Iterable): The iteratable variable that needs thready-ready split.
-        splits (int, optional): Number of splits to be done on the iterable. Defaults to 1.
+        shard (int): The index of the worker, from 0.
+        format (str, optional): "csv" or "parquet". Defaults to "csv".
 
     Returns:
-        Iterable[List[Any]]: Returns the thread-ready split of the iteratable.
+        str: The path.
     """
-    return numpy.array_split(iteratable, splits)
+    return f"{working_path}{dataset_path}{shards_path}data-{shard:06d}.{format}"
 
 
-def generate_thread(ciphers: List[str], thread_id: ValueProxy, keys: List[int]) -> None:
+def generate_thread(
+    ciphers: List[str], shard: int, keys: List[int], format: str = "csv"
+) -> Tuple[str, int]:
     """
-    Generate the dataset (thread-ready).
+    Generate a shard of the dataset (thread-ready).
 
     Args:
         ciphers (List[str]): List of words that needs to encrypted.
-        thread_id (ValueProxy[int]): Shareable int variable for identifying threads.
-        keys (List[int]): List of keys to generate the encrypted words.
+        shard (int): Index of the batch of words, names its shard file.
+        keys (List[int]): List of keys to generate the encrypted words, the
+            `key` of every row is the key modulo 26.
+        format (str, optional): "csv" or "parquet". Defaults to "csv".
+
+    Returns:
+        Tuple[str, int]: The path of the shard file written and its rows.
     """
 
     assert os.path.exists(
-        f"{working_path}{dataset_path}"
+        f"{working_path}{dataset_path}{shards_path}"
     ), """
         Dataset directory does not exist. Please make one by calling
         the `make()` function.
@@ -89,18 +185,147 @@ def generate_thread(ciphers: List[str], thread_id: ValueProxy, keys: List[int])
         Refer `make()` for more details.
         """
 
-    thread_id.value += 1
-    print(f"Started thread {thread_id.value}")
+    # A (word, shift) pair is only written once.
+    words: List[str] = list(dict.fromkeys(str(word) for word in ciphers))
+    shifts: List[int] = unique_shifts(keys)
+
+    # Written under a temporary name and renamed once complete, so a shard
+    # file is never seen half written.
+    path: str = shard_filename(shard, format)
+    with storage.writer(temporary(path)) as rows:
+        for start in range(0, len(words), block_size):
+            rows.write(*encrypt_block(words[start:start + block_size], shifts))
+    os.replace(temporary(path), path)
+
+    return path, len(words) * len(shifts)
+
+
+# Set in every worker process by _init_worker(), so that they are sent once
+# instead of with every batch.
+_keys: List[int] = []
+_format: str = "csv"
+
+
+def _init_worker(keys: List[int], format: str) -> None:
+    global _keys, _format
+    _keys, _format = keys, format
+
+
+def _generate_batch(batch: Tuple[int, List[str]]) -> Tuple[int, str, int]:
+    shard, words = batch
+    path, rows = generate_thread(words, shard, _keys, _format)
+    return shard, path, rows
+
+
+def batches(words: List[str], size: int = batch_size) -> Iterator[Tuple[int, List[str]]]:
+    """Cut words into numbered batches, only as they are asked for.
+
+    Args:
+        words (List[str]): The words.
+        size (int, optional): Words per batch. Defaults to `batch_size`.
+
+    Yields:
+        Iterator[Tuple[int, List[str]]]: The index of the batch and its words.
+    """
+    for shard, start in enumerate(range(0, len(words), size)):
+        yield shard, words[start:start + size]
+
+
+def format_progress(rows: int, total: int, seconds: float) -> str:
+    """A progress line, like `rows=52000/1177904 (4%), 815000 rows/s, ETA 1s`.
+
+    Args:
+        rows (int): Rows written.
+        total (int): Rows to write.
+        seconds (float): Seconds since the start.
+
+    Returns:
+        str: The line.
+    """
+    rate = rows / seconds if seconds > 0 else 0.0
+    eta = f"{(total - rows) / rate:.0f}s" if rate > 0 else "?"
+    share = rows / total if total else 1.0
+    return f"rows={rows}/{total} ({share:.0%}), {rate:.0f} rows/s, ETA {eta}"
+
+
+def merge(shards: List[str], keep: bool = False, format: Optional[str] = None) -> str:
+    """Join shard files, in the given order, into the dataset file of their format.
+
+    Args:
+        shards (List[str]): Paths of the shard files.
+        keep (bool, optional): Keep the shard files. Defaults to False.
+        format (Optional[str], optional): "csv" or "parquet". Defaults to
+            the format of the shards, "csv" if there are none.
+
+    Returns:
+        str: The path of the dataset file, empty if there are no shards.
+    """
+    if format is None:
+        format = storage.format_of(shards[0]) if shards else "csv"
+    path: str = dataset_file(format)
+    storage.concatenate(shards, temporary(path))
+    os.replace(temporary(path), path)
+
+    if not keep:
+        for shard in shards:
+            os.remove(shard)
+    return path
+
+
+def shards() -> List[str]:
+    """The complete shard files of the last run, in order.
+
+    Returns:
+        List[str]: Their paths, for loading them without a merge.
+    """
+    return sorted(
+        path for format in storage.formats
+        for path in glob.glob(f"{working_path}{dataset_path}{shards_path}data-*.{format}")
+    )
+
+
+def generate(
+    words: Iterable[str],
+    keys: Iterable[int],
+    processes: int = threads,
+    format: str = "csv",
+    batch_size: int = batch_size,
+    progress: Optional[TextIO] = None,
+) -> str:
+    """Generate the dataset with a pool of worker processes. Call `make()` first.
+
+    Args:
+        words (Iterable[str]): The words to encrypt, duplicates are dropped.
+        keys (Iterable[int]): The keys to encrypt every word with.
+        processes (int, optional): Worker processes. Defaults to `threads`.
+        format (str, optional): "csv" or "parquet". Defaults to "csv".
+        batch_size (int, optional): Words per task. Defaults to `batch_size`.
+        progress (Optional[TextIO], optional): Where to report progress,
+            at most every `progress_interval` seconds. Defaults to stdout.
+
+    Returns:
+        str: The path of the dataset file.
+    """
+    corpus_words: List[str] = list(dict.fromkeys(str(word) for word in words))
+    shifts: List[int] = unique_shifts(keys)
+    total: int = len(corpus_words) * len(shifts)
 
-    with open(f"{working_path}{dataset_path}/{dataset_filename}", "a") as csv:
-        for word in ciphers:
-            for key in keys:
-                result = CaesarCipher(word, offset=key).encoded
-                print(
-                    f"thread={thread_id.value}, word={word}, key={key}, cipher={result}",
-                    end="\r",
-                )
-                csv.write(f"{word},{key},{result}\n")
+    paths: Dict[int, str] = {}
+    done: int = 0
+    start = reported = time.monotonic()
+    with multiprocessing.Pool(
+        processes, initializer=_init_worker, initargs=(shifts, format)
+    ) as pool:
+        for shard, path, rows in pool.imap_unordered(
+            _generate_batch, batches(corpus_words, batch_size)
+        ):
+            paths[shard] = path
+            done += rows
+            if time.monotonic() - reported >= progress_interval:
+                reported = time.monotonic()
+                print(format_progress(done, total, reported - start), end="\r", file=progress)
 
+    print(format_progress(done, total, time.monotonic() - start), file=progress)
     # Alert when done
-    print("\a")
+    print("\a", end="", file=progress)
+    return merge([paths[shard] for shard in sorted(paths)], format=format)
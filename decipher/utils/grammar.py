@@ -0,0 +1,201 @@
+"""
+Grammar correction of recovered plaintexts, in chunks.
+
+The text is split into paragraphs, and paragraphs that are too long into
+sentences. The chunks are corrected concurrently by a bounded pool of
+threads, each a request to the LanguageTool server, and stitched back
+together with their original separators. Corrected chunks are cached by
+their SHA-256, so text that was corrected before is not sent again. The
+cache lives in memory, so it only pays off in a long-running process like
+the `--serve` daemon, every CLI call starts with an empty one. The time
+spent correcting is kept apart from the time spent cracking.
+
+Any object with a `correct(text) -> str` method can stand in for
+LanguageTool as the backend.
+
+Example: -
+
+```python
+from decipher.utils.grammar import GrammarCorrector
+
+corrector = GrammarCorrector()  # LanguageTool starts on first use
+print(corrector.correct(plaintext))
+print(f"{corrector.seconds:.2f}s, {corrector.hits} cached chunks")
+
+
+class Shout(object):
+    def correct(self, text):
+        return text.upper()
+
+
+GrammarCorrector(Shout()).correct("one.\\n\\ntwo.")  # "ONE.\\n\\nTWO."
+```
+"""
+
+import re
+import time
+import hashlib
+import functools
+import threading
+import collections
+import concurrent.futures
+
+from typing import Any, Dict, List, Optional
+
+
+# Characters of a paragraph before it is split into sentences.
+max_chunk_size: int = 2000
+# Chunks corrected at the same time.
+grammar_workers: int = 4
+# Corrected chunks kept in the cache.
+cache_size: int = 4096
+
+# Split on blank lines, the separator is kept as a chunk of its own.
+PARAGRAPH_PATTERN = re.compile(r"(\n\s*\n)")
+# Split after the end of a sentence, again keeping the whitespace.
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])(\s+)")
+
+
+@functools.lru_cache(maxsize=None)
+def language_tool() -> Any:
+    """Start the LanguageTool server on first use, it is reused after that.
+
+    Returns:
+        Any: The `language_tool_python.LanguageTool` for "en-US".
+    """
+    import language_tool_python
+
+    return language_tool_python.LanguageTool("en-US")
+
+
+def split_chunks(text: str, max_size: int = max_chunk_size) -> List[str]:
+    """Split a text into paragraphs, and paragraphs longer than `max_size`
+    into sentences. Joining the chunks gives back the text.
+
+    Args:
+        text (str): The text to split.
+        max_size (int, optional): Longest paragraph kept whole.
+            Defaults to `max_chunk_size`.
+
+    Returns:
+        List[str]: The chunks, the whitespace between them included.
+    """
+    chunks: List[str] = []
+    for paragraph in PARAGRAPH_PATTERN.split(text):
+        if len(paragraph) <= max_size:
+            chunks.append(paragraph)
+            continue
+        # Sentences are grouped back together up to max_size.
+        chunk = ""
+        for sentence in SENTENCE_PATTERN.split(paragraph):
+            if chunk and not sentence.isspace() and len(chunk) + len(sentence) > max_size:
+                chunks.append(chunk)
+                chunk = ""
+            chunk += sentence
+        chunks.append(chunk)
+    return [chunk for chunk in chunks if chunk]
+
+
+class GrammarCorrector(object):
+    """Corrects texts chunk by chunk with a bounded pool of threads and a
+    cache of corrected chunks.
+
+    Args:
+        backend (Any, optional): Has a `correct(text) -> str` method.
+            Defaults to the LanguageTool server.
+        workers (int, optional): Chunks corrected at the same time.
+            Defaults to `grammar_workers`.
+        max_size (int, optional): Longest paragraph kept whole.
+            Defaults to `max_chunk_size`.
+        cache_size (int, optional): Corrected chunks kept. Defaults to `cache_size`.
+    """
+
+    def __init__(
+        self,
+        backend: Any = None,
+        workers: int = grammar_workers,
+        max_size: int = max_chunk_size,
+        cache_size: int = cache_size,
+    ) -> None:
+        super().__init__()
+        self.__backend = backend
+        self.workers = workers
+        self.max_size = max_size
+        self.cache_size = cache_size
+        self.cache: "collections.OrderedDict[str, str]" = collections.OrderedDict()
+        self.lock = threading.Lock()
+        # Seconds spent correcting, chunks answered from the cache and chunks
+        # sent to the backend, over all calls.
+        self.seconds = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self) -> Any:
+        if self.__backend is None:
+            self.__backend = language_tool()
+        return self.__backend
+
+    @staticmethod
+    def digest(chunk: str) -> str:
+        return hashlib.sha256(chunk.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def cached(self, digest: str) -> Optional[str]:
+        with self.lock:
+            corrected = self.cache.get(digest)
+            if corrected is not None:
+                self.cache.move_to_end(digest)
+            return corrected
+
+    def remember(self, digest: str, corrected: str) -> None:
+        with self.lock:
+            self.cache[digest] = corrected
+            self.cache.move_to_end(digest)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def correct(self, text: str) -> str:
+        """Correct the grammar of a text.
+
+        Args:
+            text (str): The text to correct.
+
+        Returns:
+            str: The corrected text.
+        """
+        start = time.perf_counter()
+        chunks = split_chunks(text, self.max_size)
+        digests = [self.digest(chunk) for chunk in chunks]
+
+        # Every distinct chunk not in the cache goes to the backend once.
+        corrected: Dict[str, str] = {}
+        missing: Dict[str, str] = {}
+        for chunk, digest in zip(chunks, digests):
+            if chunk.isspace() or digest in corrected or digest in missing:
+                continue
+            cached = self.cached(digest)
+            if cached is None:
+                missing[digest] = chunk
+            else:
+                corrected[digest] = cached
+
+        if len(missing) <= 1 or self.workers <= 1:
+            results = [self.backend.correct(chunk) for chunk in missing.values()]
+        else:
+            backend = self.backend  # started once, before the threads use it
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(self.workers, len(missing))
+            ) as executor:
+                results = list(executor.map(backend.correct, missing.values()))
+        for digest, result in zip(missing, results):
+            self.remember(digest, result)
+            corrected[digest] = result
+
+        with self.lock:
+            self.hits += len(corrected) - len(missing)
+            self.misses += len(missing)
+            self.seconds += time.perf_counter() - start
+        return "".join(
+            chunk if chunk.isspace() else corrected[digest]
+            for chunk, digest in zip(chunks, digests)
+        )
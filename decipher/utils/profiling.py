@@ -0,0 +1,180 @@
+"""
+Per-stage timings and counters of the cracking pipeline.
+
+The pipeline reports to `profiling.active`, which is a `NullProfiler` that
+does nothing until `enable()` swaps in a `Profiler`. Stages are timed with
+`with profiling.active.stage("name"):` and counted with
+`profiling.active.count("name", n)`, both are calls to empty methods while
+profiling is off. Only the current process is profiled, the worker
+processes of `--workers` and `--batch` are not.
+
+Example: -
+
+```python
+import decipher.utils.profiling as profiling
+from decipher.utils.vig import hack
+
+with profiling.session(dump="crack") as profiler:  # also crack.pstats, crack.memory.txt
+    hack(ciphertext)
+
+print(profiler.table())
+```
+
+```
+stage                      calls   seconds
+kasiski                        1     0.004
+...
+counter                                value
+candidate keys                           208
+```
+"""
+
+import sys
+import json
+import time
+import cProfile
+import contextlib
+import tracemalloc
+
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+
+class NullProfiler(object):
+    """Profiler used while profiling is off, all of it does nothing."""
+
+    enabled = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.__stage = contextlib.nullcontext()
+
+    def stage(self, name: str) -> ContextManager:
+        return self.__stage
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+
+class Profiler(object):
+    """Adds up the wall time of every stage and the value of every counter."""
+
+    enabled = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self) -> Dict[str, Any]:
+        """The stages and counters, as JSON-ready data.
+
+        Returns:
+            Dict[str, Any]: `{"stages": {name: {"calls", "seconds"}}, "counters": {name: value}}`
+        """
+        return {
+            "stages": {
+                name: {"calls": self.calls[name], "seconds": seconds}
+                for name, seconds in self.seconds.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def table(self) -> str:
+        lines = [f"{'stage':<24} {'calls':>7} {'seconds':>9}"]
+        for name, seconds in self.seconds.items():
+            lines.append(f"{name:<24} {self.calls[name]:>7} {seconds:>9.3f}")
+        lines.append("")
+        lines.append(f"{'counter':<24} {'value':>17}")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<24} {value:>17}")
+        return "\n".join(lines)
+
+
+# The profiler the pipeline reports to.
+active: Any = NullProfiler()
+
+
+def enable() -> Profiler:
+    """Start profiling with a new `Profiler`.
+
+    Returns:
+        Profiler: The profiler now in use.
+    """
+    global active
+    active = Profiler()
+    return active
+
+
+def disable() -> None:
+    global active
+    active = NullProfiler()
+
+
+@contextlib.contextmanager
+def session(dump: Optional[str] = None) -> Iterator[Profiler]:
+    """Profile the pipeline for the duration of a `with` block.
+
+    Args:
+        dump (Optional[str], optional): If given, the block is also run under
+            cProfile and tracemalloc, written to `<dump>.pstats` (open it with
+            `python -m pstats`) and `<dump>.memory.txt`.
+
+    Yields:
+        Iterator[Profiler]: The profiler, report it after the block.
+    """
+    profiler = enable()
+    code_profiler = cProfile.Profile() if dump is not None else None
+    if code_profiler is not None:
+        tracemalloc.start()
+        code_profiler.enable()
+    try:
+        yield profiler
+    finally:
+        disable()
+        if code_profiler is not None:
+            code_profiler.disable()
+            code_profiler.dump_stats(f"{dump}.pstats")
+            write_memory_report(f"{dump}.memory.txt")
+            tracemalloc.stop()
+
+
+def write_memory_report(path: str, top: int = 25) -> None:
+    """Write the peak traced memory and the lines that allocated the most.
+
+    Args:
+        path (str): The text file to write.
+        top (int, optional): Lines listed. Defaults to 25.
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    with open(path, "w") as file:
+        file.write(f"current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB\n\n")
+        for statistic in snapshot.statistics("lineno")[:top]:
+            file.write(f"{statistic}\n")
+
+
+def print_report(profiler: Profiler, format: str = "table", file: Any = None) -> None:
+    """Print the report of a profiler, to stderr by default.
+
+    Args:
+        profiler (Profiler): The profiler to report.
+        format (str, optional): "table" or "json". Defaults to "table".
+        file (Any, optional): Where to print. Defaults to stderr.
+    """
+    print(profiler.json() if format == "json" else profiler.table(), file=file or sys.stderr)
@@ -1,15 +1,32 @@
-from dataframe import DecipherDataFrame
-from generator import working_path, dataset_path, dataset_filename
+import sys
+
+import decipher.utils.storage as storage
+
+from typing import Optional
+
+from decipher.utils.dataframe import DecipherDataFrame
+from decipher.utils.generator import working_path, dataset_path, dataset_file
+
+repaired_filename: str = "repaired.csv"
+
+
+def repaired_file(format: str = "csv") -> str:
+    # Path of the repaired dataset in a format, next to the dataset.
+    return storage.with_format(f"{working_path}{dataset_path}/{repaired_filename}", format)
 
 
 class DecipherRepairDataFrame(object):
     def __init__(
         self,
-        decipher_dataframe: DecipherDataFrame = DecipherDataFrame(
-            path=f"{working_path}{dataset_path}/{dataset_filename}"
-        ),
+        decipher_dataframe: Optional[DecipherDataFrame] = None,
+        format: str = "csv",
     ) -> None:
-        self.decipher_dataframe = decipher_dataframe
+        # The dataset is read from and saved in the same format, see
+        # --dataset-format and decipher.utils.storage.
+        self.format = format
+        self.decipher_dataframe = decipher_dataframe or DecipherDataFrame(
+            path=dataset_file(format)
+        )
 
         self.__corrupted_lines: list = []
         self.__lines: int = 1
@@ -38,10 +55,15 @@ class DecipherRepairDataFrame(object):
         self.decipher_dataframe.x.map(self.__debug_rows).max()
         self.decipher_dataframe.dataframe.drop(self.__corrupted_lines)
 
-    def save(self, filename: str = f"{working_path}{dataset_path}/repaired.csv") -> None:
-        self.decipher_dataframe.dataframe.to_csv(filename, index=False)
+    def save(self, filename: Optional[str] = None) -> None:
+        # Parquet for a .parquet filename, see decipher.utils.storage.
+        storage.write(self.decipher_dataframe.dataframe, filename or repaired_file(self.format))
 
 
 if __name__ == "__main__":
-    repair = DecipherRepairDataFrame()
+    # python -m decipher.utils.repair [csv|parquet]
+    format = sys.argv[1] if len(sys.argv) > 1 else "csv"
+    if format not in storage.formats:
+        sys.exit(f"Unknown dataset format {format!r}, use one of {', '.join(storage.formats)}")
+    repair = DecipherRepairDataFrame(format=format)
     repair.save()
@@ -0,0 +1,306 @@
+"""
+Reads and writes the dataset as CSV or as Parquet.
+
+CSV is the original format: `data.csv` has no header, while `repaired.csv`
+and `final.csv` do, `read(...)` tells them apart by their first line. Parquet
+keeps typed columns (the source word dictionary-encoded, the key as int8,
+the cipher text as a string), compressed in row groups. Only the columns
+asked for are read, a range of rows only reads the row groups it falls in,
+and the file is memory mapped. Parquet needs `pyarrow`, which is only
+imported when a Parquet file is used.
+
+The format of a file is told by its extension, see `format_of(...)`.
+
+Example: -
+
+```python
+import decipher.utils.storage as storage
+
+with storage.writer(".decipher/dataset/data.parquet") as rows:
+    rows.write(["apple", "apple"], [0, 1], ["apple", "bqqmf"])
+
+storage.read(".decipher/dataset/data.parquet", columns=["converted"], rows=range(0, 1))
+
+for chunk in storage.iter_chunks(".decipher/dataset/data.csv", chunk_size=100_000):
+    ...  # a DataFrame of at most 100 000 rows
+```
+"""
+
+import os
+import shutil
+import functools
+
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+
+formats: Tuple[str, ...] = ("csv", "parquet")
+extensions: Tuple[str, ...] = (".csv", ".parquet")
+# Columns of the dataset, in the order of the CSV rows.
+column_names: List[str] = ["source", "key", "converted"]
+# Rows per row group of Parquet files written from a DataFrame.
+row_group_size: int = 256 * 1024
+# Codec of Parquet files.
+compression: str = "zstd"
+
+
+@functools.lru_cache(maxsize=None)
+def arrow() -> Tuple[Any, Any]:
+    """Import `pyarrow` on first use.
+
+    Raises:
+        ImportError: `pyarrow` is not installed.
+
+    Returns:
+        Tuple[Any, Any]: The `pyarrow` and `pyarrow.parquet` modules.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            "the parquet dataset format needs pyarrow, install it or use the csv format"
+        ) from error
+
+    return pyarrow, pyarrow.parquet
+
+
+def format_of(path: str) -> str:
+    """The format of a file, "parquet" for `.parquet` files and "csv" otherwise.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        str: "csv" or "parquet".
+    """
+    return "parquet" if path.endswith(".parquet") else "csv"
+
+
+def with_format(path: str, format: str) -> str:
+    """Change the extension of a path to that of a format.
+
+    Args:
+        path (str): Path with a `.csv` or `.parquet` extension, or none.
+        format (str): "csv" or "parquet".
+
+    Returns:
+        str: The path with the extension of the format.
+    """
+    assert format in formats, f"unknown dataset format {format}, use one of {formats}"
+    root, extension = os.path.splitext(path)
+    return f"{root if extension in extensions else path}.{format}"
+
+
+class RowWriter(object):
+    """Writes dataset rows, in a `with` block or until `close()`."""
+
+    def write(self, sources: Sequence[str], keys: Sequence[int], ciphers: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def __enter__(self) -> "RowWriter":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+class CSVWriter(RowWriter):
+    """Writes headerless rows of `source,key,converted` to a CSV file."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.file = open(path, "w")
+
+    def write(self, sources: Sequence[str], keys: Sequence[int], ciphers: Sequence[str]) -> None:
+        self.file.write("".join(
+            f"{source},{key},{cipher}\n" for source, key, cipher in zip(sources, keys, ciphers)
+        ))
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetWriter(RowWriter):
+    """Writes rows to a Parquet file, a row group per `write(...)` call."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        pyarrow, parquet = arrow()
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([
+            ("source", pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+            ("key", pyarrow.int8()),
+            ("converted", pyarrow.string()),
+        ])
+        self.file = parquet.ParquetWriter(path, self.schema, compression=compression)
+
+    def write(self, sources: Sequence[str], keys: Sequence[int], ciphers: Sequence[str]) -> None:
+        pyarrow = self.pyarrow
+        self.file.write_table(pyarrow.table(
+            [
+                pyarrow.array(sources, pyarrow.string()).dictionary_encode(),
+                pyarrow.array(keys, pyarrow.int8()),
+                pyarrow.array(ciphers, pyarrow.string()),
+            ],
+            schema=self.schema,
+        ))
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def writer(path: str) -> RowWriter:
+    """Open a writer of dataset rows in the format of the path.
+
+    Args:
+        path (str): The file to write, replaced if it exists.
+
+    Returns:
+        RowWriter: The writer, use it in a `with` block.
+    """
+    return ParquetWriter(path) if format_of(path) == "parquet" else CSVWriter(path)
+
+
+def concatenate(paths: List[str], destination: str) -> None:
+    """Join dataset files of one format, in order, into `destination`.
+    Parquet row groups are copied one at a time.
+
+    Args:
+        paths (List[str]): The files to join.
+        destination (str): The file to write, in the same format.
+    """
+    if format_of(destination) == "csv":
+        with open(destination, "wb") as joined:
+            for path in paths:
+                with open(path, "rb") as rows:
+                    shutil.copyfileobj(rows, joined, length=1 << 20)
+        return
+
+    _, parquet = arrow()
+    with ParquetWriter(destination) as joined:
+        for path in paths:
+            file = parquet.ParquetFile(path, memory_map=True)
+            for group in range(file.num_row_groups):
+                joined.file.write_table(file.read_row_group(group))
+
+
+def has_header(path: str) -> bool:
+    # The rows of data.csv have an integer key in their second column, a
+    # header has a name there.
+    with open(path) as file:
+        fields = file.readline().rstrip("\r\n").split(",")
+    return len(fields) > 1 and not fields[1].lstrip("-").isdigit()
+
+
+def read(
+    path: str,
+    columns: Optional[List[str]] = None,
+    rows: Optional[range] = None,
+    memory_map: bool = True,
+) -> Any:
+    """Read a dataset file into a DataFrame.
+
+    Args:
+        path (str): A `.csv` or `.parquet` file.
+        columns (Optional[List[str]], optional): Columns to read, all if None.
+        rows (Optional[range], optional): Rows to read, like `range(1000, 2000)`,
+            all if None.
+        memory_map (bool, optional): Memory map a Parquet file. Defaults to True.
+
+    Returns:
+        pandas.DataFrame: The rows, `source`, `key` and `converted` for a
+            dataset without a header.
+    """
+    if format_of(path) == "csv":
+        import pandas
+
+        header = has_header(path)
+        return pandas.read_csv(
+            path,
+            header=0 if header else None,
+            names=None if header else column_names,
+            usecols=columns,
+            skiprows=None if rows is None else range(int(header), rows.start + int(header)),
+            nrows=None if rows is None else len(rows),
+            # Words like NULL and NA are words, only empty fields are missing.
+            keep_default_na=False,
+            na_values=[""],
+        )
+
+    _, parquet = arrow()
+    file = parquet.ParquetFile(path, memory_map=memory_map)
+    if rows is None:
+        return file.read(columns=columns).to_pandas()
+
+    # Only the row groups the rows fall in are read.
+    groups, first, start = [], None, 0
+    for group in range(file.num_row_groups):
+        stop = start + file.metadata.row_group(group).num_rows
+        if start < rows.stop and stop > rows.start:
+            groups.append(group)
+            first = start if first is None else first
+        start = stop
+    if not groups:
+        return file.schema_arrow.empty_table().select(columns or file.schema_arrow.names).to_pandas()
+    table = file.read_row_groups(groups, columns=columns)
+    return table.slice(rows.start - first, len(rows)).to_pandas()
+
+
+def iter_chunks(
+    path: str, chunk_size: int, columns: Optional[List[str]] = None, memory_map: bool = True
+) -> Iterator[Any]:
+    """Read a dataset file a chunk of rows at a time, so that only one chunk
+    is in memory at once.
+
+    Args:
+        path (str): A `.csv` or `.parquet` file.
+        chunk_size (int): Rows per chunk.
+        columns (Optional[List[str]], optional): Columns to read, all if None.
+        memory_map (bool, optional): Memory map a Parquet file. Defaults to True.
+
+    Yields:
+        Iterator[pandas.DataFrame]: The chunks, in the order of the file.
+    """
+    if format_of(path) == "csv":
+        import pandas
+
+        header = has_header(path)
+        with pandas.read_csv(
+            path,
+            header=0 if header else None,
+            names=None if header else column_names,
+            usecols=columns,
+            chunksize=chunk_size,
+            keep_default_na=False,
+            na_values=[""],
+        ) as chunks:
+            yield from chunks
+        return
+
+    _, parquet = arrow()
+    file = parquet.ParquetFile(path, memory_map=memory_map)
+    for batch in file.iter_batches(batch_size=chunk_size, columns=columns):
+        yield batch.to_pandas()
+
+
+def write(dataframe: Any, path: str) -> None:
+    """Write a DataFrame in the format of the path, CSV with a header.
+
+    Args:
+        dataframe (pandas.DataFrame): The rows.
+        path (str): A `.csv` or `.parquet` file.
+    """
+    if format_of(path) == "csv":
+        dataframe.to_csv(path, index=False)
+        return
+
+    pyarrow, parquet = arrow()
+    parquet.write_table(
+        pyarrow.Table.from_pandas(dataframe, preserve_index=False),
+        path,
+        compression=compression,
+        row_group_size=row_group_size,
+    )
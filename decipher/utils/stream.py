@@ -0,0 +1,108 @@
+"""
+Cracks files too large to load into memory.
+
+The key is recovered from a bounded prefix of the file, then the whole file
+is decrypted chunk by chunk. Memory use stays the same whatever the size of
+the file.
+
+Example: -
+
+```python
+import sys
+import decipher.utils.stream as stream
+
+result = stream.recover_key("capture.txt")
+
+if result is not None:
+    with open("capture.txt", newline="") as source:
+        stream.decrypt_stream(result.key, source, sys.stdout)
+```
+"""
+
+import sys
+
+from typing import Any, Optional, TextIO
+
+from decipher.utils.vig import CipherText, HackResult, hack_key
+
+
+# Characters read from the start of the file to recover the key from.
+sample_size: int = 64 * 1024
+# Characters decrypted at a time.
+chunk_size: int = 1024 * 1024
+
+
+def recover_key(
+    path: str, sample_size: int = sample_size, **options: Any
+) -> Optional[HackResult]:
+    """Recover the key of a file from its first `sample_size` characters.
+
+    Args:
+        path (str): The encrypted file.
+        sample_size (int, optional): Characters to read. Defaults to `sample_size`.
+        **options: Passed on to `hack_key(...)`, like `workers` or `scorer`.
+
+    Returns:
+        Optional[HackResult]: The key and the decrypted prefix, None if no
+            key was found.
+    """
+    with open(path, newline="") as file:
+        return hack_key(file.read(sample_size), **options)
+
+
+def decrypt_stream(
+    key: str, source: TextIO, destination: TextIO, chunk_size: int = chunk_size
+) -> int:
+    """Decrypt `source` into `destination` one chunk at a time. The position
+    in the key is carried from chunk to chunk.
+
+    Args:
+        key (str): The key to decrypt with.
+        source (TextIO): The encrypted text.
+        destination (TextIO): Where the plaintext is written to.
+        chunk_size (int, optional): Characters per chunk. Defaults to `chunk_size`.
+
+    Returns:
+        int: Number of letters decrypted.
+    """
+    letters = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return letters
+        cipher = CipherText(chunk, offset=letters % len(key))
+        destination.write(cipher.decrypt_text(key))
+        letters += len(cipher.letters)
+
+
+def crack_file(
+    path: str,
+    output: Optional[str] = None,
+    sample_size: int = sample_size,
+    chunk_size: int = chunk_size,
+    **options: Any,
+) -> Optional[HackResult]:
+    """Recover the key of a file and stream the decrypted file to `output`.
+
+    Args:
+        path (str): The encrypted file.
+        output (Optional[str], optional): Plaintext file, stdout if None.
+        sample_size (int, optional): Characters to recover the key from.
+        chunk_size (int, optional): Characters decrypted at a time.
+        **options: Passed on to `hack_key(...)`, like `workers` or `scorer`.
+
+    Returns:
+        Optional[HackResult]: The recovered key, None if no key was found
+            (nothing is written then).
+    """
+    result = recover_key(path, sample_size, **options)
+    if result is None:
+        return None
+
+    with open(path, newline="") as source:
+        if output is None:
+            decrypt_stream(result.key, source, sys.stdout, chunk_size)
+        else:
+            with open(output, "w", newline="") as destination:
+                decrypt_stream(result.key, source, destination, chunk_size)
+    return result
@@ -0,0 +1,16 @@
+from decipher.utils.vig import encrypt
+from decipher.utils.caesar import crack
+
+pangram = "The quick brown fox jumps over the lazy dog"
+
+
+def test_short_caesar_text_is_cracked_as_caesar() -> None:
+    cipher, result = crack(encrypt("D", pangram))
+    assert cipher == "caesar"
+    assert result.key == "D"
+    assert result.plaintext == pangram
+
+
+if __name__ == "__main__":
+    test_short_caesar_text_is_cracked_as_caesar()
+    print("ok")
@@ -0,0 +1,90 @@
+import time
+import threading
+
+from typing import List
+
+from decipher.utils.grammar import GrammarCorrector, split_chunks
+
+text = (
+    "first paragraph. it has two sentences.\n\n"
+    "second paragraph is much longer! " * 20
+    + "\n \n"
+    "third one? yes.\n\n"
+    "first paragraph. it has two sentences."
+)
+
+
+class FakeBackend(object):
+    """Upper-cases a chunk after a short wait, and records every call."""
+
+    def __init__(self, delay: float = 0.0, fail_on: str = "") -> None:
+        self.delay = delay
+        self.fail_on = fail_on
+        self.calls: List[str] = []
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def correct(self, chunk: str) -> str:
+        with self.lock:
+            self.calls.append(chunk)
+            self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        if self.fail_on and self.fail_on in chunk:
+            raise RuntimeError(f"cannot correct {chunk!r}")
+        return chunk.upper()
+
+
+def test_split_chunks_joins_back() -> None:
+    for max_size in (10, 40, 100, 2000):
+        chunks = split_chunks(text, max_size)
+        assert "".join(chunks) == text
+        assert all(chunks)
+    assert len(split_chunks(text, 40)) > len(split_chunks(text, 2000))
+
+
+def test_cached_chunks_skip_the_backend() -> None:
+    backend = FakeBackend()
+    corrector = GrammarCorrector(backend, workers=1, max_size=100)
+    assert corrector.correct(text) == text.upper()
+    calls = len(backend.calls)
+    # The repeated first paragraph was only sent once.
+    assert calls == len(set(backend.calls))
+
+    assert corrector.correct(text) == text.upper()
+    assert len(backend.calls) == calls
+    assert corrector.hits > 0 and corrector.misses == calls
+
+    # Only the least recently used chunks are dropped.
+    small = GrammarCorrector(backend, workers=1, cache_size=1)
+    small.correct("one.\n\ntwo.")
+    small.correct("two.")
+    assert backend.calls[-2:] == ["one.", "two."]
+    small.correct("one.")
+    assert backend.calls[-1] == "one."
+
+
+def test_threads_keep_the_order() -> None:
+    backend = FakeBackend(delay=0.01)
+    corrector = GrammarCorrector(backend, workers=4, max_size=40)
+    assert corrector.correct(text) == text.upper()
+    assert len(backend.threads) > 1
+
+
+def test_threads_surface_errors() -> None:
+    corrector = GrammarCorrector(FakeBackend(fail_on="third"), workers=4, max_size=40)
+    try:
+        corrector.correct(text)
+    except RuntimeError as error:
+        assert "third" in str(error)
+    else:
+        raise AssertionError("the backend error was swallowed")
+    # The failed chunk is not cached.
+    assert all("THIRD" not in chunk for chunk in corrector.cache.values())
+
+
+if __name__ == "__main__":
+    test_split_chunks_joins_back()
+    test_cached_chunks_skip_the_backend()
+    test_threads_keep_the_order()
+    test_threads_surface_errors()
+    print("ok")
@@ -1,7 +1,7 @@
 from typing import Final
 
-from dataframe import DecipherDataFrame
-from vectorizer import DecipherCustomLightWeightVectorizer
+from decipher.utils.dataframe import DecipherDataFrame
+from decipher.utils.vectorizer import DecipherCustomLightWeightVectorizer
 
 if __name__ == "__main__":
     vectorizer: Final = DecipherCustomLightWeightVectorizer(
@@ -0,0 +1,67 @@
+import time
+import random
+
+from decipher.utils.vig import (
+    LETTERS, MIN_KEY_LENGTH_CONFIDENCE, SAMPLE_WINDOW_SIZE, BestCandidates, HackResult, as_cipher_text,
+    encrypt, hack_key, rank_key_lengths, sample_windows, shortest_period,
+)
+
+
+def random_text(size: int, seed: int = 0) -> str:
+    letters = random.Random(seed)
+    return "".join(letters.choice(LETTERS) for _ in range(size))
+
+
+def test_random_text_is_rejected_quickly() -> None:
+    for size in (2_000, 20_000):
+        text = random_text(size)
+        assert all(confidence < MIN_KEY_LENGTH_CONFIDENCE for _, confidence in rank_key_lengths(text))
+
+        start = time.perf_counter()
+        assert hack_key(text) is None
+        assert time.perf_counter() - start < 1.0
+
+
+def test_sample_windows_are_small_and_apart() -> None:
+    letters = random_text(96_000, seed=1)
+    spaced = " ".join(letters[i:i + 6] for i in range(0, len(letters), 6))
+    for text in (random_text(96_000), spaced):
+        windows = sample_windows(text)
+        assert windows is not None
+        assert all(stop - start <= 2 * SAMPLE_WINDOW_SIZE for start, stop in windows)
+        assert all(stop <= start for (_, stop), (start, _) in zip(windows, windows[1:]))
+        assert 4 * sum(stop - start for start, stop in windows) <= len(text)
+
+    assert sample_windows(random_text(1_000)) is None
+
+
+def test_candidates_are_most_confident_first() -> None:
+    tried = BestCandidates(topK=3)
+    tried.best = [(0.1, -2.0, "XYZ"), (0.72, -1.0, "ABC")]
+    tried.last = {"KEY": 0.23}
+    candidates = tried.candidates(as_cipher_text("Some text"), HackResult("KEY", "plain", -3.0))
+    assert [candidate.key for candidate in candidates] == ["ABC", "KEY", "XYZ"]
+    assert [candidate.english for candidate in candidates] == [False, True, False]
+
+
+def test_one_letter_key_is_not_doubled() -> None:
+    assert shortest_period("KK") == "K"
+    assert shortest_period("ABAB") == "AB"
+    assert shortest_period("ABA") == "ABA"
+
+    plaintext = (
+        "The quick brown fox jumps over the lazy dog and runs away from the farmer, "
+        "who was standing in the field with his old dog and his young horse."
+    )
+    result = hack_key(encrypt("K", plaintext))
+    assert result is not None
+    assert result.key == "K"
+    assert result.plaintext == plaintext
+
+
+if __name__ == "__main__":
+    test_random_text_is_rejected_quickly()
+    test_sample_windows_are_small_and_apart()
+    test_candidates_are_most_confident_first()
+    test_one_letter_key_is_not_doubled()
+    print("ok")
@@ -3,9 +3,11 @@ import pickle
 import pandas
 import sklearn.preprocessing
 
+import decipher.utils.storage as storage
+
 from typing import Final
-from snips import Singleton
-from generator import working_path, dataset_filename, dataset_path
+from decipher.utils.snips import Singleton
+from decipher.utils.generator import working_path, dataset_filename, dataset_path
 
 line = 1
 
@@ -64,14 +66,13 @@ class DecipherCustomLightWeightVectorizer(object, metaclass=Singleton):
             )
         return self.encrypted_encoder.fit_transform(processed)
 
-    def save_everything(self) -> None:
+    def save_everything(self, filename: str = f"{working_path}{dataset_path}final.csv") -> None:
         with open("source_encoder.pkl", "wb") as file:
             pickle.dump(self.source_encoder, file)
         with open("encrypted_encoder.pkl", "wb") as file:
             pickle.dump(self.encrypted_encoder, file)
-        self.converted_dataframe.to_csv(
-            f"{working_path}{dataset_path}final.csv", index=False
-        )
+        # Parquet for a .parquet filename, see decipher.utils.storage.
+        storage.write(self.converted_dataframe, filename)
 
     @property
     def converted_dataframe(self) -> pandas.DataFrame:
@@ -1,12 +1,20 @@
+import collections
+import concurrent.futures
+import heapq
 import itertools
+import multiprocessing
 import re
+import time
+
+import numpy
+
+from decipher.utils.dictionary import WordList
+import decipher.utils.profiling as profiling
 
 
 def load_dictionary():
-    with open('dictionary.txt') as file:
-        englishWords = {
-            word: None for word in file.read().split('\n')}
-    return englishWords
+    # The word list is loaded lazily by ENGLISH_WORDS, this forces it.
+    return ENGLISH_WORDS.words
 
 # frequency taken from http://en.wikipedia.org/wiki/Letter_frequency
 
@@ -21,7 +29,143 @@ LETTERS_AND_SPACE = LETTERS + LETTERS.lower() + ' \t\n'
 NUM_MOST_FREQ_LETTERS = 4
 MAX_KEY_LENGTH = 16
 NONLETTERS_PATTERN = re.compile('[^A-Z]')
-ENGLISH_WORDS = load_dictionary()
+WHITESPACE_PATTERN = re.compile(r'\s')
+CANDIDATE_BATCH_SIZE = 16
+MAX_SEQUENCE_SPACINGS = 1000
+LARGE_SEQUENCE_GROUP = 64
+# index of coincidence of English text and of uniformly random letters
+ENGLISH_IOC = 0.0667
+RANDOM_IOC = 1 / 26
+IOC_WEIGHT = 0.5
+MIN_KEY_LENGTH_CONFIDENCE = 0.3
+# Below this normalised IoC at every key length nothing looks like English
+# (random text, or not a Vigenère cipher), see rank_key_lengths().
+MIN_IOC_SCORE = 0.25
+MAX_KEY_CANDIDATES = 10000
+# Long messages are first checked on SAMPLE_WINDOWS windows of about
+# SAMPLE_WINDOW_SIZE characters, see sample_windows().
+SAMPLE_WINDOW_SIZE = 100
+SAMPLE_WINDOWS = 3
+# Seconds between checks of the cancelled event while waiting on workers.
+CANCEL_POLL_INTERVAL = 0.05
+COLUMN_SCORING = 'loglik'  # 'chi2', 'loglik' or 'etaoin', see score_column_shifts()
+# Read from disk on first use, see decipher.utils.dictionary.
+ENGLISH_WORDS = WordList()
+
+
+# A recovered key, its decryption and the joint score of its subkeys.
+HackResult = collections.namedtuple('HackResult', ['key', 'plaintext', 'score'])
+# A key tried by hack_anytime(), with its decryption, the joint score of its
+# subkeys, its confidence (see candidate_confidences()) and whether its
+# decryption passed as English.
+Candidate = collections.namedtuple(
+    'Candidate', ['key', 'plaintext', 'score', 'confidence', 'english'])
+
+# ENGLISH_LETTER_FREQUENCY as probabilities and ETAOIN ranks, both indexed
+# by letter index (0 for 'A' ... 25 for 'Z').
+ENGLISH_FREQUENCIES = numpy.array([ENGLISH_LETTER_FREQUENCY[letter] for letter in LETTERS])
+ENGLISH_FREQUENCIES = ENGLISH_FREQUENCIES / ENGLISH_FREQUENCIES.sum()
+ETAOIN_RANKS = numpy.array([ETAOIN.find(letter) for letter in LETTERS])
+
+
+class CipherText(object):
+    # A message converted once into arrays, so that it can be decrypted
+    # with any number of keys without walking it character by character.
+    #   codes   - unicode code points of the whole message
+    #   mask    - True where the code point is an ASCII letter
+    #   letters - uint8 letter index (0-25) of every letter in the message
+    #   upper   - True where that letter was uppercase
+    #   offset  - key phase, i.e. how many letters came before the message
+    #   positions - key position of every letter when they are not simply
+    #               consecutive from offset (see sample()), otherwise None
+    def __init__(self, message, offset=0):
+        self.message = message
+        self.offset = offset
+        self.positions = None
+        self.codes = numpy.frombuffer(
+            message.encode('utf-32-le', 'surrogatepass'), dtype=numpy.uint32)
+        is_upper = (self.codes >= ord('A')) & (self.codes <= ord('Z'))
+        is_lower = (self.codes >= ord('a')) & (self.codes <= ord('z'))
+        self.mask = is_upper | is_lower
+        self.upper = is_upper[self.mask]
+        # 'A' and 'a' both have 1 in their low five bits, 'Z' and 'z' 26.
+        self.letters = ((self.codes[self.mask] & 0x1F) - 1).astype(numpy.uint8)
+
+    def decrypt(self, key):
+        # Returns the plaintext letter indexes for a single key.
+        return self.decrypt_batch([key])[0]
+
+    def decrypt_batch(self, keys):
+        # Returns a (len(keys), len(self.letters)) uint8 array, one row of
+        # plaintext letter indexes per key.
+        return decrypt_letters(self.letters, keys, self.offset, self.positions)
+
+    def to_text(self, letters):
+        # Puts plaintext letter indexes back into the message, keeping the
+        # original case and every non-letter symbol as it was.
+        codes = self.codes.copy()
+        codes[self.mask] = letters + numpy.where(
+            self.upper, ord('A'), ord('a')).astype(numpy.uint32)
+        return codes.tobytes().decode('utf-32-le', 'surrogatepass')
+
+    def decrypt_text(self, key):
+        return self.to_text(self.decrypt(key))
+
+    def sample(self, windows):
+        # Returns a CipherText of the message slices in windows, a list of
+        # (start, stop) character ranges, joined by spaces. Every letter
+        # keeps its key position, so the sample decrypts to exactly the
+        # same letters as the whole message would.
+        lettersBefore = numpy.r_[0, numpy.cumsum(self.mask)]
+        positions = self.positions
+        if positions is None:
+            positions = numpy.arange(self.offset, self.offset + len(self.letters))
+
+        sample = CipherText(' '.join(self.message[start:stop] for start, stop in windows))
+        sample.positions = numpy.concatenate([
+            positions[lettersBefore[start]:lettersBefore[stop]] for start, stop in windows
+        ])
+        return sample
+
+
+def as_cipher_text(message):
+    # Lets every function accept either a plain string or a CipherText
+    # that has already been converted.
+    if isinstance(message, CipherText):
+        return message
+    return CipherText(message)
+
+
+def key_indexes(key):
+    # Converts a key like 'ASIMOV' into its letter indexes [0, 18, 8, ...].
+    # Arrays of indexes are passed through unchanged.
+    if isinstance(key, str):
+        key = numpy.frombuffer(key.upper().encode('ascii'), dtype=numpy.uint8)
+        if ((key < ord('A')) | (key > ord('Z'))).any():
+            raise ValueError('key must only contain the letters A-Z')
+        return key - ord('A')
+    return numpy.asarray(key, dtype=numpy.uint8)
+
+
+def letters_to_string(letters):
+    # Converts letter indexes back into an uppercase string.
+    return (numpy.asarray(letters, dtype=numpy.uint8) + ord('A')).tobytes().decode('ascii')
+
+
+def decrypt_letters(letters, keys, offset=0, positions=None):
+    # Decrypts an array of letter indexes with every key in keys in one
+    # broadcasted operation. Keys may be strings or index arrays and may
+    # differ in length. Returns one row of plaintext letter indexes per key.
+    # The letters are at key positions offset, offset + 1, ... unless their
+    # positions are given.
+    if positions is None:
+        positions = numpy.arange(offset, offset + len(letters))
+    keys = [key_indexes(key) for key in keys]
+    if len({len(key) for key in keys}) == 1:
+        key_stream = numpy.stack(keys)[:, positions % len(keys[0])]
+    else:
+        key_stream = numpy.stack([key[positions % len(key)] for key in keys])
+    return (letters + 26 - key_stream) % 26
 
 
 def get_english_count(message):
@@ -31,7 +175,8 @@ def get_english_count(message):
     if possible_words == []:
         return 0.0  # no words at all, so return 0.0
 
-    matches = sum(word in ENGLISH_WORDS for word in possible_words)
+    englishWords = ENGLISH_WORDS.words
+    matches = sum(word in englishWords for word in possible_words)
     return float(matches) / len(possible_words)
 
 
@@ -41,10 +186,14 @@ def remove_non_letters(message):
     return ''.join(letters_only)
 
 
-def is_english(message, word_percentage=20, letter_percentage=85):
+def is_english(message, word_percentage=20, letter_percentage=85, scorer=None):
     # By default, 20% of the words must exist in the dictionary file, and
     # 85% of all the characters in the message must be letters or spaces
-    # (not punctuation or numbers).
+    # (not punctuation or numbers). A fitness scorer like
+    # decipher.utils.fitness.QuadgramScorer can be used instead, then the
+    # message must reach the threshold of the scorer.
+    if scorer is not None:
+        return scorer.is_english(message)
     words_match = get_english_count(message) * 100 >= word_percentage
     num_letters = len(remove_non_letters(message))
     message_letters_percentage = float(num_letters) / len(message) * 100
@@ -116,33 +265,70 @@ def english_freq_match_score(message):
     return matchScore
 
 
-def decrypt(key, message):
-    translated = []  # stores the encrypted/decrypted message string
-
-    keyIndex = 0
-    key = key.upper()
-
-    for symbol in message:  # loop through each character in message
-        num = LETTERS.find(symbol.upper())
-        if num != -1:  # -1 means symbol.upper() was not found in LETTERS
-            num -= LETTERS.find(key[keyIndex])  # subtract if decrypting
+def shifted_histograms(letters):
+    # Counts the letters once and returns a (26, 26) array where row k is
+    # the letter histogram of the letters decrypted with subkey k. Since
+    # decrypting with k maps cipher letter (p + k) % 26 to p, row k is just
+    # the histogram rolled left by k.
+    counts = numpy.bincount(letters, minlength=26)
+    shifts = numpy.arange(26)
+    return counts[(shifts[:, numpy.newaxis] + shifts[numpy.newaxis, :]) % 26]
+
+
+def freq_match_scores(histograms):
+    # english_freq_match_score() for every row of letter histograms. Letters
+    # are ordered by count and then in reverse "ETAOIN" order, exactly like
+    # get_frequency_order() does.
+    histograms = numpy.atleast_2d(histograms)
+    etaoinRanks = numpy.broadcast_to(ETAOIN_RANKS, histograms.shape)
+    freqOrder = numpy.lexsort((-etaoinRanks, -histograms), axis=-1)
+    mostCommon = ETAOIN_RANKS[freqOrder[:, :6]] < 6
+    leastCommon = ETAOIN_RANKS[freqOrder[:, -6:]] >= len(ETAOIN) - 6
+    return mostCommon.sum(axis=1) + leastCommon.sum(axis=1)
+
+
+def score_column_shifts(letters, method=COLUMN_SCORING):
+    # Scores all 26 possible subkeys of one key column at once. Returns an
+    # array of 26 scores where item k belongs to subkey LETTERS[k] and a
+    # higher score means more English-like:
+    #   'chi2'   - negated chi-squared distance to ENGLISH_LETTER_FREQUENCY
+    #   'loglik' - log-likelihood of the decrypted column under
+    #              ENGLISH_LETTER_FREQUENCY
+    #   'etaoin' - english_freq_match_score() of the decrypted column
+    histograms = shifted_histograms(letters)
+    if method == 'chi2':
+        expected = max(len(letters), 1) * ENGLISH_FREQUENCIES
+        return -((histograms - expected) ** 2 / expected).sum(axis=1)
+    if method == 'loglik':
+        return histograms @ numpy.log(ENGLISH_FREQUENCIES)
+    if method == 'etaoin':
+        return freq_match_scores(histograms).astype(float)
+    raise ValueError('unknown column scoring method %r' % method)
+
+
+def score_key_columns(ciphertext, keyLength, method=COLUMN_SCORING):
+    # Returns a (keyLength, 26) array with the score of every subkey for
+    # every position in the key, see score_column_shifts().
+    cipher = as_cipher_text(ciphertext)
+    # The column a letter belongs to depends on the key phase.
+    phase = (-cipher.offset) % keyLength
+    return numpy.stack([
+        score_column_shifts(cipher.letters[(phase + nth) % keyLength::keyLength], method)
+        for nth in range(keyLength)
+    ])
 
-            num %= len(LETTERS)  # handle the potential wrap-around
 
-            # add the encrypted/decrypted symbol to the end of translated.
-            if symbol.isupper():
-                translated.append(LETTERS[num])
-            elif symbol.islower():
-                translated.append(LETTERS[num].lower())
+def decrypt(key, message):
+    # Decrypts the whole message at once using CipherText. Symbols that are
+    # not letters are kept as is and the case of every letter is preserved.
+    return CipherText(message).decrypt_text(key)
 
-            keyIndex += 1  # move to the next letter in the key
-            if keyIndex == len(key):
-                keyIndex = 0
-        else:
-            # The symbol was not in LETTERS, so add it to translated as is.
-            translated.append(symbol)
 
-    return ''.join(translated)
+def encrypt(key, message):
+    # Encrypting with a key is decrypting with its inverse, the key whose
+    # letters shift back by as much as the key's letters shift forward.
+    inverseKey = (26 - key_indexes(key)) % 26
+    return CipherText(message).decrypt_text(inverseKey)
 
 
 def main():
@@ -163,32 +349,121 @@ H hsz vrpbgmq kush fkz xpv hv Dnskafz, iak eza shqqexkzr ha ezde mr aan—we ha
         print(hackedMessage)
 
 
-def findRepeatSequencesSpacings(message):
+def findRepeatSequencesSpacings(message, maxSpacings=MAX_SEQUENCE_SPACINGS):
     # Goes through the message and finds any 3 to 5 letter sequences
     # that are repeated. Returns a dict with the keys of the sequence and
     # values of a list of spacings (num of letters between the repeats).
+    # At most maxSpacings spacings are kept per sequence, pass None to keep
+    # all of them (this can use a lot of memory on repetitive input).
+    cipher = as_cipher_text(message)
+    seqLens, seqStarts, firsts, seconds = repeatSequencePairs(cipher, maxSpacings)
+    if len(firsts) == 0:
+        return {}
+    spacings = (seconds - firsts).tolist()
+
+    # Every sequence is identified by its length and where it first repeats.
+    bounds = numpy.flatnonzero(numpy.r_[
+        True, (seqLens[1:] != seqLens[:-1]) | (seqStarts[1:] != seqStarts[:-1]), True])
+    seqSpacings = {}  # keys are sequences, values are list of int spacings
+    for begin, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        seqStart, seqLen = int(seqStarts[begin]), int(seqLens[begin])
+        seq = letters_to_string(cipher.letters[seqStart:seqStart + seqLen])
+        seqSpacings[seq] = spacings[begin:end]
+    return seqSpacings
 
-    # Use a regular expression to remove non-letters from the message.
-    message = NONLETTERS_PATTERN.sub('', message.upper())
 
-    # Compile a list of seqLen-letter sequences found in the message.
-    seqSpacings = {}  # keys are sequences, values are list of int spacings
+def repeatSequencePairs(message, maxSpacings=MAX_SEQUENCE_SPACINGS):
+    # Finds every pair of repeats of a 3 to 5 letter sequence. Returns four
+    # arrays with one item per pair: the length of the sequence, where the
+    # sequence first repeats, the start of the repeat and the start of the
+    # later repeat. The pairs are in the order the original quadratic scan
+    # found them in findRepeatSequencesSpacings().
+    #
+    # Every seqLen-letter window is packed into one integer code and the
+    # codes are sorted, so equal windows end up next to each other instead
+    # of comparing every window against every later one.
+    letters = as_cipher_text(message).letters.astype(numpy.int64)
+
+    pairs = []
     for seqLen in range(3, 6):
-        for seqStart in range(len(message) - seqLen):
-            # Determine what the sequence is, and store it in seq
-            seq = message[seqStart:seqStart + seqLen]
-
-            # Look for this sequence in the rest of the message
-            for i in range(seqStart + seqLen, len(message) - seqLen):
-                if message[i:i + seqLen] == seq:
-                    # Found a repeated sequence.
-                    if seq not in seqSpacings:
-                        seqSpacings[seq] = []  # initialize blank list
-
-                    # Append the spacing distance between the repeated
-                    # sequence and the original sequence.
-                    seqSpacings[seq].append(i - seqStart)
-    return seqSpacings
+        # As in the original quadratic scan, the window starting at
+        # len(letters) - seqLen is never looked at.
+        numWindows = len(letters) - seqLen
+        if numWindows < 2:
+            continue
+
+        codes = numpy.zeros(numWindows, dtype=numpy.int64)
+        for i in range(seqLen):
+            codes = codes * 26 + letters[i:i + numWindows]
+        # The stable sort keeps the starts of equal windows in ascending order.
+        starts = numpy.argsort(codes, kind='stable')
+        sortedCodes = codes[starts]
+        newGroup = numpy.r_[True, sortedCodes[1:] != sortedCodes[:-1]]
+        groupIds = numpy.cumsum(newGroup) - 1
+        groupSizes = numpy.bincount(groupIds)
+
+        groups, firsts, seconds = _group_pairs(starts, groupIds, groupSizes, seqLen, maxSpacings)
+        if len(groups) == 0:
+            continue
+
+        # Sort by group and start, keep maxSpacings pairs per group, then put
+        # the groups in the order of where they first repeat.
+        order = numpy.lexsort((seconds, firsts, groups))
+        groups, firsts, seconds = groups[order], firsts[order], seconds[order]
+        newGroup = numpy.r_[True, groups[1:] != groups[:-1]]
+        groupStart = numpy.flatnonzero(newGroup)[numpy.cumsum(newGroup) - 1]
+        # Where each sequence first repeats, the start of its first pair.
+        seqStarts = firsts[groupStart]
+        if maxSpacings is not None:
+            keep = numpy.arange(len(groups)) - groupStart < maxSpacings
+            seqStarts, firsts, seconds = seqStarts[keep], firsts[keep], seconds[keep]
+        order = numpy.lexsort((seconds, firsts, seqStarts))
+        pairs.append((numpy.full(len(order), seqLen), seqStarts[order], firsts[order], seconds[order]))
+
+    if not pairs:
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        return empty, empty, empty, empty
+    return tuple(numpy.concatenate(column) for column in zip(*pairs))
+
+
+def _group_pairs(starts, groupIds, groupSizes, seqLen, maxSpacings):
+    # Returns (group, start, later start) arrays for every pair of windows
+    # of the same group (equal windows) that do not overlap. Groups of at
+    # most LARGE_SEQUENCE_GROUP windows are paired all at once, one distance
+    # d in the sorted order at a time. Bigger groups are paired one start at
+    # a time so that they can stop as soon as maxSpacings pairs are found.
+    groups, firsts, seconds = [], [], []
+
+    small = groupSizes[groupIds] <= LARGE_SEQUENCE_GROUP
+    for d in range(1, min(int(groupSizes.max()), LARGE_SEQUENCE_GROUP)):
+        same = (groupIds[:-d] == groupIds[d:]) & small[d:]
+        if not same.any():
+            break
+        index = numpy.flatnonzero(same)
+        first, second = starts[index], starts[index + d]
+        # Only repeats that start after the sequence ended are counted.
+        apart = second - first >= seqLen
+        groups.append(groupIds[index][apart])
+        firsts.append(first[apart])
+        seconds.append(second[apart])
+
+    groupFirst = numpy.r_[0, numpy.cumsum(groupSizes)[:-1]]
+    for group in numpy.flatnonzero(groupSizes > LARGE_SEQUENCE_GROUP).tolist():
+        positions = starts[groupFirst[group]:groupFirst[group] + groupSizes[group]]
+        found = 0
+        for first in positions.tolist():
+            later = positions[numpy.searchsorted(positions, first + seqLen):]
+            groups.append(numpy.full(len(later), group))
+            firsts.append(numpy.full(len(later), first))
+            seconds.append(later)
+            found += len(later)
+            if maxSpacings is not None and found >= maxSpacings:
+                break
+
+    if not groups:
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        return empty, empty, empty
+    return numpy.concatenate(groups), numpy.concatenate(firsts), numpy.concatenate(seconds)
 
 
 def getUsefulFactors(num):
@@ -240,25 +515,106 @@ def getMostCommonFactors(seqFactors):
     return factorsByCount
 
 
-def kasiski_examination(ciphertext):
+def getUsefulFactorCounts(spacings):
+    # Vectorized getUsefulFactors() + getMostCommonFactors() for a list of
+    # spacings. Every factor from 2 to MAX_KEY_LENGTH that divides a spacing
+    # is useful, so counting them is a single divisibility test. Returns
+    # [(factor, count), ...] sorted by count, ties going to the factor that
+    # showed up first in the spacings.
+    spacings = numpy.asarray(spacings, dtype=numpy.int64)
+    if len(spacings) == 0:
+        return []
+    factors = numpy.arange(2, MAX_KEY_LENGTH + 1)
+    divides = spacings[:, numpy.newaxis] % factors == 0
+    counts = divides.sum(axis=0)
+    firstSeen = numpy.where(divides.any(axis=0), divides.argmax(axis=0), len(spacings))
+
+    factorsByCount = [
+        (factor, count, first)
+        for factor, count, first in zip(factors.tolist(), counts.tolist(), firstSeen.tolist())
+        if count > 0
+    ]
+    factorsByCount.sort(key=lambda x: (-x[1], x[2]))
+    return [(factor, count) for factor, count, _ in factorsByCount]
+
+
+def kasiski_examination(ciphertext, maxSpacings=MAX_SEQUENCE_SPACINGS):
     # Find out the sequences of 3 to 5 letters that occur multiple times
     # in the ciphertext. repeatedSeqSpacings has a value like:
     # {'EXG': [192], 'NAF': [339, 972, 633], ... }
-    repeatedSeqSpacings = findRepeatSequencesSpacings(ciphertext)
-
-    # See getMostCommonFactors() for a description of seqFactors.
-    seqFactors = {}
-    for seq in repeatedSeqSpacings:
-        seqFactors[seq] = []
-        for spacing in repeatedSeqSpacings[seq]:
-            seqFactors[seq].extend(getUsefulFactors(spacing))
+    # The spacings are taken straight from the repeat pairs, in the same
+    # order findRepeatSequencesSpacings() lists them, without building the
+    # dict of sequences.
+    _, _, firsts, seconds = repeatSequencePairs(ciphertext, maxSpacings)
 
-    # See getMostCommonFactors() for a description of factorsByCount.
-    factorsByCount = getMostCommonFactors(seqFactors)
+    # See getUsefulFactorCounts() for a description of factorsByCount.
+    factorsByCount = getUsefulFactorCounts(seconds - firsts)
 
     return [twoIntTuple[0] for twoIntTuple in factorsByCount]
 
 
+def index_of_coincidence(ciphertext, maxKeyLength=MAX_KEY_LENGTH):
+    # Returns an array where item L - 1 is the mean index of coincidence of
+    # the L columns the ciphertext splits into for a key of length L. The
+    # right key length (and its multiples) gives columns that look like
+    # English (about ENGLISH_IOC), wrong ones look random (about RANDOM_IOC).
+    # Periods whose columns have fewer than two letters are nan.
+    letters = as_cipher_text(ciphertext).letters.astype(numpy.int64)
+    positions = numpy.arange(len(letters))
+
+    iocs = numpy.full(maxKeyLength, numpy.nan)
+    for keyLength in range(1, maxKeyLength + 1):
+        # One 26-bin letter histogram per column, counted in a single pass.
+        counts = numpy.bincount(
+            (positions % keyLength) * 26 + letters, minlength=keyLength * 26,
+        ).reshape(keyLength, 26)
+        totals = counts.sum(axis=1)
+        valid = totals > 1
+        if valid.any():
+            coincidences = (counts * (counts - 1)).sum(axis=1)[valid]
+            iocs[keyLength - 1] = (coincidences / (totals * (totals - 1))[valid]).mean()
+    return iocs
+
+
+def rank_key_lengths(ciphertext, maxKeyLength=MAX_KEY_LENGTH, iocWeight=IOC_WEIGHT):
+    # Returns [(keyLength, confidence), ...] for every key length from 1 to
+    # maxKeyLength, most likely first. The confidence (0 to 1) mixes how
+    # English-like the columns are (index of coincidence) with how often
+    # the length divides the Kasiski spacings. When no key length has
+    # English-like columns (best IoC below MIN_IOC_SCORE) the Kasiski
+    # counts are ignored: they are relative to the commonest factor, so
+    # some length of random text would always reach the cut-off.
+    cipher = as_cipher_text(ciphertext)
+
+    with profiling.active.stage('index of coincidence'):
+        iocScores = (index_of_coincidence(cipher, maxKeyLength) - RANDOM_IOC) / (ENGLISH_IOC - RANDOM_IOC)
+    iocScores = numpy.clip(numpy.nan_to_num(iocScores, nan=0.0), 0.0, 1.0)
+
+    kasiskiScores = numpy.zeros(maxKeyLength)
+    with profiling.active.stage('kasiski'):
+        _, _, firsts, seconds = repeatSequencePairs(cipher)
+        factorsByCount = getUsefulFactorCounts(seconds - firsts)
+    profiling.active.count('repeated sequences', len(firsts))
+    factorsByCount = [(factor, count) for factor, count in factorsByCount if factor <= maxKeyLength]
+    if factorsByCount:
+        mostCommon = factorsByCount[0][1]
+        for factor, count in factorsByCount:
+            kasiskiScores[factor - 1] = count / mostCommon
+    else:
+        # Nothing repeats (usually a short ciphertext), rely on the IoC.
+        iocWeight = 1.0
+    if iocScores.max() < MIN_IOC_SCORE:
+        kasiskiScores[:] = 0.0
+
+    confidence = iocWeight * iocScores + (1 - iocWeight) * kasiskiScores
+    ranked = [(keyLength, float(confidence[keyLength - 1])) for keyLength in range(1, maxKeyLength + 1)]
+    # Shorter lengths win ties. Length 1 gets no Kasiski credit (1 divides
+    # every spacing), so a one-letter key usually ranks below its multiples,
+    # search_key_length() reduces the key it finds to its shortest period.
+    ranked.sort(key=lambda x: (-x[1], x[0]))
+    return ranked
+
+
 def getNthSubkeysLetters(n, keyLength, message):
     # Returns every Nth letter for each keyLength set of letters in text.
     # E.g. getNthSubkeysLetters(1, 3, 'ABCABCABC') returns 'AAA'
@@ -277,76 +633,322 @@ def getNthSubkeysLetters(n, keyLength, message):
     return ''.join(letters)
 
 
-def hack_with_key_lengths(ciphertext, mostLikelyKeyLength):
-    # Determine the most likely letters for each letter in the key.
-    ciphertextUp = ciphertext.upper()
-    # allFreqScores is a list of mostLikelyKeyLength number of lists.
-    # These inner lists are the freqScores lists.
-    allFreqScores = []
-    for nth in range(1, mostLikelyKeyLength + 1):
-        nthLetters = getNthSubkeysLetters(
-            nth, mostLikelyKeyLength, ciphertextUp)
-
-        # freqScores is a list of tuples like:
-        # [(<letter>, <Eng. Freq. match score>), ... ]
-        # List is sorted by match score. Higher score means better match.
-        # See the englishFreqMatchScore() comments in freqAnalysis.py.
-        freqScores = []
-        for possibleKey in LETTERS:
-            decryptedText = decrypt(
-                possibleKey, nthLetters)
-            keyAndFreqMatchTuple = (
-                possibleKey, english_freq_match_score(decryptedText))
-            freqScores.append(keyAndFreqMatchTuple)
-        # Sort by match score
-        freqScores.sort(key=lambda x: x[1], reverse=True)
-
-        allFreqScores.append(freqScores[:NUM_MOST_FREQ_LETTERS])
-
-    # Try every combination of the most likely letters for each position
-    # in the key.
-    for indexes in itertools.product(range(NUM_MOST_FREQ_LETTERS), repeat=mostLikelyKeyLength):
-        # Create a possible key from the letters in allFreqScores
-        possibleKey = ''.join(
-            allFreqScores[i][indexes[i]][0] for i in range(mostLikelyKeyLength)
-        )
-
-        decryptedText = decrypt(
-            possibleKey, ciphertextUp)
-
-        if is_english(decryptedText):
-            origCase = []
-            for i in range(len(ciphertext)):
-                if ciphertext[i].isupper():
-                    origCase.append(decryptedText[i].upper())
-                else:
-                    origCase.append(decryptedText[i].lower())
-            decryptedText = ''.join(origCase)
-
-            return decryptedText
+def sample_windows(message, size=SAMPLE_WINDOW_SIZE, count=SAMPLE_WINDOWS):
+    # Returns count (start, stop) character ranges of about size characters
+    # spread evenly over the message, from its start to its end. The ranges
+    # are moved to whitespace within size characters so that no word is cut
+    # in half, text without whitespace is cut at size. No range is longer
+    # than 2 * size and none overlaps the one before it. Returns None when
+    # the message is too short for sampling to save any work, or when the
+    # sample would not be under a quarter of the message.
+    if len(message) < 4 * size * count:
+        return None
+
+    windows = []
+    previousStop = 0
+    for start in numpy.linspace(0, len(message) - size, count).astype(int).tolist():
+        start = max(start, previousStop)
+        if start > 0:
+            space = WHITESPACE_PATTERN.search(message, start, start + size)
+            start = space.end() if space is not None else start
+        space = WHITESPACE_PATTERN.search(message, start + size, start + 2 * size)
+        stop = min(space.start() if space is not None else start + size, len(message))
+        if stop > start:
+            windows.append((start, stop))
+            previousStop = stop
+
+    if not windows or 4 * sum(stop - start for start, stop in windows) > len(message):
+        return None
+    return windows
+
+
+def shortest_period(key):
+    # Returns the shortest key that repeats into key, e.g. 'K' for 'KK' and
+    # 'AB' for 'ABAB'. Both decrypt a message the same way.
+    for length in range(1, len(key)):
+        if len(key) % length == 0 and key[:length] * (len(key) // length) == key:
+            return key[:length]
+    return key
+
+
+def best_first_keys(columnScores, beamWidth=NUM_MOST_FREQ_LETTERS, maxCandidates=MAX_KEY_CANDIDATES):
+    # Yields (key, score) pairs in descending joint score, the joint score
+    # being the sum of the subkey scores from score_key_columns(). Only the
+    # beamWidth best subkeys of every column are considered and at most
+    # maxCandidates keys are yielded (None for no limit).
+    #
+    # A search state is a tuple with the rank of the chosen subkey in every
+    # column. Its children move one column to the next best subkey, which
+    # can only lower the score, so a priority queue pops the states in
+    # score order. Only columns at or after the last moved one may move,
+    # that way every state is reached from exactly one parent.
+    columnScores = numpy.atleast_2d(columnScores)
+    subkeys = numpy.argsort(-columnScores, axis=1, kind='stable')[:, :beamWidth]
+    ranked = numpy.take_along_axis(columnScores, subkeys, axis=1)
+    keyLength, width = ranked.shape
+    columns = numpy.arange(keyLength)
+
+    start = (0,) * keyLength
+    queue = [(-ranked[:, 0].sum(), start, 0)]
+    candidates = 0
+    while queue and (maxCandidates is None or candidates < maxCandidates):
+        negScore, ranks, lastMoved = heapq.heappop(queue)
+        yield letters_to_string(subkeys[columns, ranks]), float(-negScore)
+        candidates += 1
+
+        for column in range(lastMoved, keyLength):
+            if ranks[column] + 1 < width:
+                child = ranks[:column] + (ranks[column] + 1,) + ranks[column + 1:]
+                heapq.heappush(queue, (-ranked[columns, child].sum(), child, column))
+
+
+def english_rows(cipher, decryptedBatch, scorer=None):
+    # Tells for every row of plaintext letter indexes decrypted from cipher
+    # whether it passes as English. With a fitness scorer all rows are
+    # scored in one call, otherwise each row goes through is_english() as
+    # it is asked for.
+    if scorer is not None:
+        return scorer.score_letters(decryptedBatch) >= scorer.threshold
+    return (is_english(cipher.to_text(decryptedLetters)) for decryptedLetters in decryptedBatch)
+
+
+def search_key_length(ciphertext, keyLength, method=COLUMN_SCORING,
+                      beamWidth=NUM_MOST_FREQ_LETTERS, maxCandidates=MAX_KEY_CANDIDATES,
+                      cancelled=None, scorer=None, tried=None):
+    # Tries the keys of length keyLength in descending score and returns a
+    # HackResult for the first one that decrypts to English, or None. The
+    # search gives up between batches once the cancelled event is set.
+    # English is recognised by is_english(), or by the scorer if given.
+    # Every batch of keys is also shown to tried (see BestCandidates) if
+    # given, with the decryptions they were first tested on.
+    #
+    # On long messages every key is first tried on a sample of the message
+    # (see sample_windows()). Only the keys whose sample looks like English
+    # decrypt the whole message, almost all keys are rejected before that.
+    cipher = as_cipher_text(ciphertext)
+    windows = sample_windows(cipher.message)
+    sample = cipher.sample(windows) if windows is not None else None
+
+    profiling.active.count('key lengths')
+    with profiling.active.stage('column scoring'):
+        columnScores = score_key_columns(cipher, keyLength, method)
+    possibleKeys = best_first_keys(columnScores, beamWidth, maxCandidates)
+
+    # Decrypt CANDIDATE_BATCH_SIZE keys per call.
+    while cancelled is None or not cancelled.is_set():
+        with profiling.active.stage('key generation'):
+            batch = list(itertools.islice(possibleKeys, CANDIDATE_BATCH_SIZE))
+        if not batch:
+            break
+        profiling.active.count('candidate keys', len(batch))
+
+        if sample is not None:
+            with profiling.active.stage('sample decryption'):
+                decryptedSamples = sample.decrypt_batch([key for key, _ in batch])
+            profiling.active.count('sample decryptions', len(batch))
+            if tried is not None:
+                tried.add(sample, batch, decryptedSamples)
+            with profiling.active.stage('sample english test'):
+                batch = [
+                    keyAndScore for keyAndScore, passed
+                    in zip(batch, english_rows(sample, decryptedSamples, scorer)) if passed
+                ]
+            if not batch:
+                continue
+
+        with profiling.active.stage('full decryption'):
+            decryptedBatch = cipher.decrypt_batch([key for key, _ in batch])
+        profiling.active.count('full decryptions', len(batch))
+        if tried is not None and sample is None:
+            tried.add(cipher, batch, decryptedBatch)
+        with profiling.active.stage('english test'):
+            # Stops at the first row that passes.
+            found = next((row for row, passed in enumerate(
+                english_rows(cipher, decryptedBatch, scorer)) if passed), None)
+        if found is not None:
+            possibleKey, score = batch[found]
+            # The original case is restored by to_text().
+            return HackResult(shortest_period(possibleKey), cipher.to_text(decryptedBatch[found]), score)
 
     # No English-looking decryption found, so return None.
     return None
 
 
-def hack(ciphertext):
-    key_lengths = kasiski_examination(ciphertext)
+def hack_with_key_lengths(ciphertext, mostLikelyKeyLength, method=COLUMN_SCORING):
+    result = search_key_length(ciphertext, mostLikelyKeyLength, method)
+    return result.plaintext if result is not None else None
+
 
-    processed_msg = None
+def hack_key(ciphertext, minConfidence=MIN_KEY_LENGTH_CONFIDENCE, workers=1, scorer=None,
+             cancelled=None):
+    # Try the key lengths most likely first (see rank_key_lengths()), and
+    # skip the ones whose confidence is below minConfidence. With more than
+    # one worker the key lengths are searched in parallel processes, see
+    # hack_key_parallel(). A fitness scorer replaces is_english() when
+    # given. The search gives up once cancelled (anything with an is_set()
+    # method) is set. Returns a HackResult or None.
+    cipher = as_cipher_text(ciphertext)
+    profiling.active.count('characters', len(cipher.message))
 
-    for keyLength in key_lengths:
-        processed_msg = hack_with_key_lengths(ciphertext, keyLength)
-        if processed_msg is not None:
+    keyLengths = [
+        keyLength for keyLength, confidence in rank_key_lengths(cipher)
+        if confidence >= minConfidence
+    ]
+    if workers > 1 and len(keyLengths) > 1:
+        return hack_key_parallel(cipher, keyLengths, workers, scorer, cancelled)
+
+    for keyLength in keyLengths:
+        if cancelled is not None and cancelled.is_set():
             break
+        result = search_key_length(cipher, keyLength, cancelled=cancelled, scorer=scorer)
+        if result is not None:
+            return result
+
+    return None
 
-    if processed_msg is None:
-        for keyLength in range(1, MAX_KEY_LENGTH + 1):
-            if keyLength not in key_lengths:
-                processed_msg = hack_with_key_lengths(ciphertext, keyLength)
-                if processed_msg is not None:
-                    break
 
-    return processed_msg
+def hack(ciphertext, minConfidence=MIN_KEY_LENGTH_CONFIDENCE, workers=1, scorer=None):
+    result = hack_key(ciphertext, minConfidence, workers, scorer)
+    return result.plaintext if result is not None else None
+
+
+def candidate_confidences(cipher, decryptedBatch, scorer=None):
+    # How English every row of plaintext letter indexes decrypted from
+    # cipher looks: the share of dictionary words (0 to 1, see
+    # get_english_count()), or the fitness of the scorer if given.
+    if scorer is not None:
+        return scorer.score_letters(decryptedBatch)
+    return numpy.array([
+        get_english_count(cipher.to_text(decryptedLetters)) for decryptedLetters in decryptedBatch
+    ])
+
+
+class BestCandidates(object):
+    # Keeps the topK most confident keys shown to it by search_key_length()
+    # and is its cancelled event: set once timeBudget seconds have passed
+    # since it was made, maxCandidates keys were tried or cancelled is set.
+    # None is no limit.
+    def __init__(self, topK=1, timeBudget=None, maxCandidates=None, cancelled=None, scorer=None):
+        self.topK = topK
+        self.deadline = None if timeBudget is None else time.monotonic() + timeBudget
+        self.maxCandidates = maxCandidates
+        self.cancelled = cancelled
+        self.scorer = scorer
+        self.tried = 0
+        # A min-heap of (confidence, score, key), the least confident on top.
+        self.best = []
+        # Confidence of the keys of the last batch, the one a found key is in.
+        self.last = {}
+
+    def is_set(self):
+        return ((self.deadline is not None and time.monotonic() >= self.deadline)
+                or (self.maxCandidates is not None and self.tried >= self.maxCandidates)
+                or (self.cancelled is not None and self.cancelled.is_set()))
+
+    def add(self, cipher, batch, decryptedBatch):
+        # batch holds (key, score) pairs, decryptedBatch their decryptions.
+        confidences = candidate_confidences(cipher, decryptedBatch, self.scorer)
+        self.tried += len(batch)
+        self.last = {}
+        for (key, score), confidence in zip(batch, confidences.tolist()):
+            self.last[key] = confidence
+            item = (confidence, score, key)
+            if len(self.best) < self.topK:
+                heapq.heappush(self.best, item)
+            elif item > self.best[0]:
+                heapq.heapreplace(self.best, item)
+
+    def candidates(self, cipher, found=None):
+        # Returns the kept keys as Candidates, most confident first. found
+        # (the HackResult of an English decryption) is always kept, in its
+        # place by confidence, with english set.
+        candidates = []
+        items = sorted(self.best, reverse=True)
+        if found is not None:
+            confidence = self.last.get(found.key, 1.0)
+            candidates.append(Candidate(found.key, found.plaintext, found.score, confidence, True))
+            items = [item for item in items if item[2] != found.key]
+        for confidence, score, key in items[:self.topK - len(candidates)]:
+            candidates.append(Candidate(key, cipher.decrypt_text(key), score, confidence, False))
+        candidates.sort(key=lambda candidate: candidate.confidence, reverse=True)
+        return candidates
+
+
+def hack_anytime(ciphertext, timeBudget=None, maxCandidates=None, topK=1,
+                 minConfidence=MIN_KEY_LENGTH_CONFIDENCE, scorer=None, cancelled=None):
+    # Like hack_key(), but stops once timeBudget seconds have passed or
+    # maxCandidates keys were tried, and then returns the most confident
+    # keys tried so far instead of nothing. Returns a list of at most topK
+    # Candidates, most confident first. If a key decrypts to English the
+    # search stops there and that key is always in the list, with english
+    # set. An empty list means no key was tried at all. Runs in this
+    # process only.
+    cipher = as_cipher_text(ciphertext)
+    profiling.active.count('characters', len(cipher.message))
+    tried = BestCandidates(topK, timeBudget, maxCandidates, cancelled, scorer)
+
+    keyLengths = [
+        keyLength for keyLength, confidence in rank_key_lengths(cipher)
+        if confidence >= minConfidence
+    ]
+    for keyLength in keyLengths:
+        if tried.is_set():
+            break
+        result = search_key_length(cipher, keyLength, cancelled=tried, scorer=scorer, tried=tried)
+        if result is not None:
+            return tried.candidates(cipher, result)
+
+    return tried.candidates(cipher)
+
+
+# Set in every worker process of hack_key_parallel(), tells the remaining
+# searches to stop once the winning key length is known.
+_cancelled = None
+
+
+def _init_search_worker(cancelled, wordListPath):
+    global _cancelled
+    _cancelled = cancelled
+    ENGLISH_WORDS.use(wordListPath)
+
+
+def _search_worker(message, offset, keyLength, scorer):
+    return search_key_length(
+        CipherText(message, offset), keyLength, cancelled=_cancelled, scorer=scorer)
+
+
+def hack_key_parallel(ciphertext, keyLengths, workers, scorer=None, cancelled=None):
+    # Searches every key length in keyLengths in a pool of worker processes.
+    # A result is only accepted once every key length before it has finished
+    # without one, so the answer is the same as the sequential search in
+    # hack_key(). The other searches are then cancelled, as are all of them
+    # once the caller's cancelled event is set.
+    cipher = as_cipher_text(ciphertext)
+    stop = multiprocessing.Event()
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_search_worker,
+        initargs=(stop, ENGLISH_WORDS.path),
+    ) as executor:
+        futures = [
+            executor.submit(_search_worker, cipher.message, cipher.offset, keyLength, scorer)
+            for keyLength in keyLengths
+        ]
+        try:
+            for future in futures:
+                while cancelled is not None and not future.done():
+                    if cancelled.is_set():
+                        return None
+                    concurrent.futures.wait([future], timeout=CANCEL_POLL_INTERVAL)
+                result = future.result()
+                if result is not None:
+                    return result
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+
+    return None
 
 
 if __name__ == '__main__':